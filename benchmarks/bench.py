@@ -0,0 +1,209 @@
+"""Offline benchmarks for the refresh pipeline.
+
+Runs against recorded fixtures (or synthetic ones at the requested scale), so
+no network is needed. Exits non-zero if a case is slower than its threshold.
+
+    python benchmarks/bench.py                       # recorded/default scale
+    python benchmarks/bench.py --accounts 500 --weeks 6
+    python benchmarks/bench.py --only process_vix --repeat 50
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+import httpx
+
+# fixtures puts src/ on sys.path
+from fixtures import HERE, load_tastytrade, load_vix, synthetic_frame
+from vixbuddy.backtest import evaluate, random_tables
+from vixbuddy.data import Data, Endpoint
+from vixbuddy.symbols import WATCHED
+
+THRESHOLDS = os.path.join(HERE, "thresholds.json")
+
+
+def quiet(message: str, header: str | None = None) -> None:
+    pass
+
+
+def response(body: dict[str, Any]) -> httpx.Response:
+    return httpx.Response(200, json=body, request=httpx.Request("GET", "http://bench"))
+
+
+def prepared(vix: dict[str, Any], accounts: dict, balances: list[dict]) -> Data:
+    data = Data(logger=quiet)
+    data.vix = dict(vix)
+    data.process_vix()
+    data.store_response(Endpoint.ACCOUNTS, response(accounts))
+    data.store_response(Endpoint.BALANCES, [response(b) for b in balances])
+    daily = {
+        symbol: synthetic_frame("1d", 35, seed=seed)
+        for seed, symbol in enumerate(WATCHED)
+    }
+    data.process_term_structure(daily)
+    return data
+
+
+def measure(case: Callable[[], Any], repeat: int) -> list[float]:
+    case()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def app_module():
+    # src/vixbuddy.py is shadowed by the vixbuddy package, load it by path
+    path = os.path.join(HERE, "..", "src", "vixbuddy.py")
+    spec = importlib.util.spec_from_file_location("vixbuddy_app", path)
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+def mount_case(data: Data, repeat: int) -> list[float]:
+    from textual.app import App
+
+    module = app_module()
+    timings = []
+
+    async def run() -> None:
+        app = App()
+        async with app.run_test(size=(200, 60)) as pilot:
+            try:
+                for _ in range(repeat + 1):
+                    start = time.perf_counter()
+                    vix_panel = module.VixPanel(data.stats_vix, data.stats_term)
+                    accounts_panel = module.AccountsPanel(data.stats_accounts)
+                    await app.screen.mount(vix_panel, accounts_panel)
+                    # the first resize mounts the account slots, a mount is
+                    # done once that has been painted
+                    await pilot.pause()
+                    async with accounts_panel.lock:
+                        timings.append(time.perf_counter() - start)
+                    await vix_panel.remove()
+                    await accounts_panel.remove()
+            finally:
+                app.exit()
+
+    asyncio.run(run())
+    return timings[1:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, help="synthetic account count")
+    parser.add_argument("--weeks", type=float, help="synthetic weeks of bars")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", action="append", help="run only these cases")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    vix = load_vix(args.weeks)
+    accounts, balances = load_tastytrade(args.accounts)
+    data = prepared(vix, accounts, balances)
+    bars = sum(len(vix[interval]) for interval in ("30m", "5m", "1m"))
+    count = len(balances)
+
+    def process_vix() -> None:
+        data.vix = dict(vix)
+        data.process_vix()
+
+    def process_balances() -> None:
+        data.store_response(Endpoint.BALANCES, [response(b) for b in balances])
+
+    def vix_tables() -> None:
+        assert data.stats_vix is not None
+        data.stats_vix.from_24day_to_DataTable()
+        data.stats_vix.from_5day_to_DataTable()
+        data.stats_vix.from_today_to_DataTable()
+
+    # ~35 years of daily closes against a sweep of band tables
+    closes = synthetic_frame("1d", 35 * 365)["Close"].to_numpy()
+    tables = random_tables(1000, seed=0)
+
+    def backtest() -> None:
+        evaluate(closes, tables)
+
+    def account_tables() -> None:
+        for account in data.stats_accounts.values():
+            account.to_DataTable()
+
+    cases: dict[str, tuple[Callable[[], list[float]], int, str]] = {
+        "process_vix": (lambda: measure(process_vix, args.repeat), bars, "bars"),
+        "process_balances": (
+            lambda: measure(process_balances, args.repeat),
+            count,
+            "accounts",
+        ),
+        "vix_tables": (lambda: measure(vix_tables, args.repeat), 3, "tables"),
+        "account_tables": (
+            lambda: measure(account_tables, args.repeat),
+            count,
+            "accounts",
+        ),
+        "mount": (lambda: mount_case(data, min(args.repeat, 5)), count, "accounts"),
+        "backtest": (
+            lambda: measure(backtest, min(args.repeat, 5)),
+            len(tables),
+            "tables",
+        ),
+    }
+
+    with open(THRESHOLDS) as f:
+        thresholds = json.load(f)
+    results = {}
+    failed = False
+    for name, (run, items, unit) in cases.items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            timings = run()
+        except ImportError as e:
+            print(f"{name:18} skipped ({e.name} not installed)", file=sys.stderr)
+            continue
+        except Exception as e:
+            failed = True
+            results[name] = {"error": f"{type(e).__name__}: {e}", "ok": False}
+            if not args.json:
+                print(f"{name:18} FAILED ({type(e).__name__}: {e})")
+            continue
+        median = statistics.median(timings)
+        p95 = sorted(timings)[min(len(timings) - 1, int(len(timings) * 0.95))]
+        # thresholds are per item so they hold at any scale
+        limit = thresholds.get(name, {}).get("max_ms_per_item")
+        per_item_ms = median * 1000 / items
+        ok = limit is None or per_item_ms <= limit
+        failed |= not ok
+        results[name] = {
+            "median_ms": median * 1000,
+            "p95_ms": p95 * 1000,
+            "throughput": items / median,
+            "unit": unit,
+            "items": items,
+            "ms_per_item": per_item_ms,
+            "limit_ms_per_item": limit,
+            "ok": ok,
+        }
+        if not args.json:
+            print(
+                f"{name:18} median {median * 1000:9.2f}ms  p95 {p95 * 1000:9.2f}ms"
+                f"  {items / median:12.0f} {unit}/s"
+                f"  {'ok' if ok else f'REGRESSION (> {limit}ms/{unit[:-1]})'}"
+            )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
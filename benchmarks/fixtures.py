@@ -0,0 +1,164 @@
+"""Recorded or synthetic inputs for the refresh pipeline.
+
+Recorded fixtures live in benchmarks/fixtures/ (see `python fixtures.py
+--record`); when they are missing, or when a larger scale is asked for, inputs
+are generated in the same shape as yfinance frames and Tastytrade JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+INTERVALS = {"1d": "1D", "30m": "30min", "5m": "5min", "1m": "1min"}
+TZ = "America/Chicago"
+
+
+def synthetic_frame(interval: str, days: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    freq = INTERVALS[interval]
+    end = pd.Timestamp.now(tz=TZ).floor(freq)
+    index = pd.date_range(end - pd.Timedelta(days=days), end, freq=freq)
+    if interval != "1d":
+        # VIX is calculated roughly 02:15-15:15 Chicago time on weekdays
+        index = index[(index.weekday < 5) & (index.hour >= 2) & (index.hour < 16)]
+    else:
+        index = index[index.weekday < 5].normalize()
+    close = 15 * np.exp(np.cumsum(rng.normal(0, 0.002, len(index))))
+    open = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.001, len(index))) * close
+    return pd.DataFrame(
+        {
+            "Open": open,
+            "High": np.maximum(open, close) + spread,
+            "Low": np.minimum(open, close) - spread,
+            "Close": close,
+            "Volume": 0,
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+
+
+def synthetic_accounts(count: int) -> dict[str, Any]:
+    return {
+        "data": {
+            "items": [
+                {
+                    "account": {
+                        "account-number": f"5WT{i:05d}",
+                        "nickname": f"account {i}",
+                        "margin-or-cash": "Margin",
+                    },
+                    "authority-level": "owner",
+                }
+                for i in range(count)
+            ]
+        }
+    }
+
+
+def synthetic_balances(count: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    net_liqs = rng.lognormal(11, 1, count)
+    return [
+        {
+            "data": {
+                "account-number": f"5WT{i:05d}",
+                "net-liquidating-value": f"{net_liq:.2f}",
+                "cash-balance": f"{net_liq * 0.6:.2f}",
+                "maintenance-requirement": f"{net_liq * rng.uniform(0, 0.6):.2f}",
+                "derivative-buying-power": f"{net_liq * 0.4:.2f}",
+            }
+        }
+        for i, net_liq in enumerate(net_liqs)
+    ]
+
+
+def load_vix(weeks: float | None = None) -> dict[str, Any]:
+    """fast_info-like dict plus one frame per interval, as Data.get_vix stores"""
+    frames = {}
+    for interval in INTERVALS:
+        path = os.path.join(FIXTURES, f"vix_{interval}.pkl")
+        if weeks is None and os.path.exists(path):
+            frames[interval] = pd.read_pickle(path)
+        else:
+            days = int((weeks or 4) * 7)
+            frames[interval] = synthetic_frame(interval, max(days, 35))
+    path = os.path.join(FIXTURES, "vix_fast_info.json")
+    if weeks is None and os.path.exists(path):
+        with open(path) as f:
+            fast_info = json.load(f)
+    else:
+        today = frames["1d"].iloc[-1]
+        fast_info = {
+            "open": float(today["Open"]),
+            "lastPrice": float(today["Close"]),
+            "dayLow": float(today["Low"]),
+            "dayHigh": float(today["High"]),
+        }
+    return {**fast_info, **frames}
+
+
+def load_tastytrade(accounts: int | None = None) -> tuple[dict, list[dict]]:
+    path = os.path.join(FIXTURES, "tastytrade.json")
+    if accounts is None and os.path.exists(path):
+        with open(path) as f:
+            recorded = json.load(f)
+        return recorded["accounts"], recorded["balances"]
+    count = accounts or 5
+    return synthetic_accounts(count), synthetic_balances(count)
+
+
+async def record() -> None:
+    from vixbuddy.api import API
+    from vixbuddy.data import Data
+
+    def logger(message: str, header: str | None = None) -> None:
+        print(f"[{header}]: {message}", file=sys.stderr)
+
+    data = Data(logger=logger)
+    api = API(data=data, logger=logger)
+    try:
+        await data.get_vix()
+        accounts = await api.get("/customers/me/accounts")
+        await api.fetch_accounts()
+        balances = await asyncio.gather(
+            *(api.fetch_balance(number) for number in data.accounts)
+        )
+    finally:
+        await api.close()
+    os.makedirs(FIXTURES, exist_ok=True)
+    for interval in INTERVALS:
+        data.vix[interval].to_pickle(os.path.join(FIXTURES, f"vix_{interval}.pkl"))
+    with open(os.path.join(FIXTURES, "vix_fast_info.json"), "w") as f:
+        keys = ["open", "lastPrice", "dayLow", "dayHigh"]
+        json.dump({key: float(data.vix[key]) for key in keys}, f)
+    with open(os.path.join(FIXTURES, "tastytrade.json"), "w") as f:
+        json.dump(
+            {
+                "accounts": accounts.json() if accounts is not None else None,
+                "balances": [b.json() for b in balances if b is not None],
+            },
+            f,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--record", action="store_true", help="record live data into fixtures/"
+    )
+    args = parser.parse_args()
+    if args.record:
+        asyncio.run(record())
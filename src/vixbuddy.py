@@ -1,16 +1,57 @@
 import time
-from functools import partial
+
+# taken before the heavy imports so time-to-first-frame includes them
+STARTED = time.perf_counter()
+
+import asyncio
+from collections import deque
 from typing import Any, Tuple
 
+from rich.text import Text
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.containers import Container, Horizontal, Vertical
+from textual.coordinate import Coordinate
 from textual.screen import Screen
 from textual.widget import Widget
-from textual.widgets import DataTable, Footer, RichLog, Sparkline
+from textual.widgets import DataTable, Footer, LoadingIndicator, RichLog, Sparkline
 
+from vixbuddy.account_streamer import Account_streamer
+from vixbuddy.allocation import AccountTable
 from vixbuddy.api import API
+from vixbuddy.bus import FPS
 from vixbuddy.data import *
+from vixbuddy.downsample import Downsampler
+from vixbuddy.logger import LOGGER
+from vixbuddy.quote_streamer import Quote_streamer
+from vixbuddy.schedule import CADENCES
+from vixbuddy.timing import TIMER
+
+LOG_INTERVAL = 0.1
+ACCOUNT_WIDTH = 36
+# (name, AccountTable column, descending)
+ACCOUNT_SORTS = [
+    ("account number", None, False),
+    ("net liq", "net_liquidating_value", True),
+    ("over-allocation", "over_allocation", True),
+]
+
+
+def cell_key(value: Any) -> Any:
+    # Text equality ignores Text.style, which carries the band colours
+    if isinstance(value, Text):
+        return (value.plain, str(value.style), value.spans)
+    return value
+
+
+def update_cells(
+    table: DataTable, old_rows: list[Tuple[Any]], new_rows: list[Tuple[Any]]
+) -> None:
+    # only touch cells whose value changed, the rows themselves are kept
+    for row, (old, new) in enumerate(zip(old_rows, new_rows)):
+        for column, (old_value, value) in enumerate(zip(old, new)):
+            if cell_key(old_value) != cell_key(value):
+                table.update_cell_at(Coordinate(row, column), value)
 
 
 class AppFooter(Footer):
@@ -57,10 +98,25 @@ class VixGraphs(Vertical):
     def __init__(self, nums: list[float] | None = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.nums = nums
+        self.downsampler = Downsampler()
 
     def compose(self) -> ComposeResult:
         yield Sparkline(self.nums, summary_function=max, id="fst")
 
+    def on_resize(self) -> None:
+        self.redraw()
+
+    def update_nums(self, nums: list[float]) -> None:
+        self.nums = nums
+        self.redraw()
+
+    def redraw(self) -> None:
+        # one (min, max) pair per column, Sparkline then buckets each pair
+        width = self.content_size.width
+        if self.nums is None or width <= 0:
+            return
+        self.query_one(Sparkline).data = self.downsampler(self.nums, width)
+
 
 class VixStats(DataTable):
     DEFAULT_CSS = """
@@ -86,6 +142,20 @@ class VixStats(DataTable):
         table.cursor_type = "none"
         table.show_header = False
 
+    def update_table(self, table: list[Tuple[Any]]) -> None:
+        update_cells(self.query_one(DataTable), self.table[1:], table[1:])
+        self.table = table
+
+
+class TermStats(VixStats):
+    DEFAULT_CSS = """
+    TermStats {
+        height: auto;
+        width: 1fr;
+        dock: left;
+    }
+    """
+
 
 class AccountStats(DataTable):
     DEFAULT_CSS = """
@@ -120,6 +190,13 @@ class AccountStats(DataTable):
         table.border_title_align = "left"
         table.border_title_align = "left"
 
+    def update_table(self, table: list[Tuple[Any]]) -> None:
+        inner = self.query_one(DataTable)
+        update_cells(inner, self.table[2:], table[2:])
+        inner.border_title = table[1][1]  # pyright: ignore
+        inner.border_subtitle = table[1][0]
+        self.table = table
+
 
 class MainContainer(Vertical):
     DEFAULT_CSS = """
@@ -131,7 +208,21 @@ class MainContainer(Vertical):
 
 
 class PortfolioView(Screen):
+    BINDINGS = [
+        Binding(key="left", action="scroll_accounts(-1)", description="prev"),
+        Binding(key="right", action="scroll_accounts(1)", description="next"),
+        Binding(key="s", action="sort_accounts", description="sort"),
+        Binding(key="f", action="filter_accounts", description="over-allocated"),
+    ]
     DEFAULT_CSS = """
+    #VixSlot {
+        height: 1fr;
+        width: 1fr;
+    }
+    #AccountsSlot {
+        height: 13;
+        width: 1fr;
+    }
     #VixContainer {
         height: 1fr;
         width: 1fr;
@@ -140,56 +231,278 @@ class PortfolioView(Screen):
     #VixContainer > Horizontal {
         # border: round grey;
     }
+    #VixRow_term {
+        height: auto;
+    }
     #AccountsContainer {
-        height: 10;
+        height: 12;
         width: 1fr;
         margin: 1 0 0 0;
     }
     #AccountsContainer > Vertical {
-        height: 10;
+        height: 12;
         width: 36;
         margin: 0 0 0 0;
     }
+    .stale {
+        opacity: 60%;
+    }
     """
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.data: Data | None = None
         self.api: API | None = None
-
-    def logger(self, message: str, destination: Widget, header: str):
-        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        # header_str = f" [{header}]: "
-        header_str = " : "
-        message_str = time_str + header_str + message
-        destination.write(f"[yellow]{message_str}")
+        self.vix_ready = asyncio.Event()
+        self.positions_ready = asyncio.Event()
+        self.streamer: Quote_streamer | None = None
+        # sources being refreshed or whose last refresh failed
+        self.stale: set[str] = set()
+        self.refreshing: dict[str, asyncio.Task] = dict()
+        self.log_sink: deque[dict[str, Any]] = deque()
+
+    def logger(self, message: str, header: str):
+        LOGGER.emit(message, header=header)
+
+    def drain_log(self) -> None:
+        # records are queued by the logger and written here once per interval
+        if not self.log_sink:
+            return
+        lines = []
+        while self.log_sink:
+            record = self.log_sink.popleft()
+            local_time = time.localtime(record["time"])
+            time_str = time.strftime("%Y-%m-%d %H:%M:%S", local_time)
+            # header_str = f" [{record['header']}]: "
+            header_str = " : "
+            lines.append(time_str + header_str + record["message"])
+        self.query_one("#log", RichLog).write(f"[yellow]{chr(10).join(lines)}")
 
     def compose(self) -> ComposeResult:
-        yield Vertical(id="MainContainer")
+        with Vertical(id="MainContainer"):
+            yield Container(LoadingIndicator(), id="VixSlot")
+            yield Container(LoadingIndicator(), id="AccountsSlot")
         yield LogContainer(id="LogContainer")
         yield AppFooter()
 
-    async def on_mount(self) -> None:
-        log_widget = self.query("#log").first()
-        logger = partial(self.logger, destination=log_widget)
-        self.data = Data(logger=logger)
-        self.api = API(data=self.data, logger=logger)
-
-        tasks = []
-        tasks.append(self.data.get_vix())
-        tasks.append(self.api.fetch_accounts())
-        for task in tasks:
-            await task
-        await self.api.fetch_balances()
-        main = self.query("#MainContainer").first()
-        main.mount(AfterProcessing(self.data.stats_vix, self.data.stats_accounts))
-
-
-class AfterProcessing(Widget):
-    def __init__(self, vix: VIX, accounts: dict[str, Account], *args, **kwargs) -> None:
+    def on_mount(self) -> None:
+        self.log_sink = LOGGER.subscribe()
+        self.set_interval(LOG_INTERVAL, self.drain_log)
+        self.set_interval(1 / FPS, self.flush_updates)
+        self.data = Data(logger=self.logger)
+        self.api = API(data=self.data, logger=self.logger)
+        self.call_after_refresh(self.elapsed, "first frame")
+        # each panel mounts as soon as its own data is in
+        self.run_worker(self.load_vix(), group="startup")
+        self.run_worker(self.load_accounts(), group="startup")
+
+    def elapsed(self, stage: str) -> None:
+        if self.data is not None:
+            milliseconds = (time.perf_counter() - STARTED) * 1000
+            self.data.log(f"{stage} after {milliseconds:.0f}ms", header="main.startup")
+
+    async def load_vix(self) -> None:
+        if self.data is None:
+            return
+        await self.data.get_vix()
+        self.vix_ready.set()
+        slot = self.query_one("#VixSlot")
+        await slot.remove_children()
+        with TIMER.span("ui.mount_vix"):
+            await slot.mount(VixPanel(self.data.stats_vix, self.data.stats_term))
+        self.elapsed("VIX panel")
+        self.run_worker(self.stream_quotes(), group="streamers", exit_on_error=False)
+        self.run_worker(self.schedule("vix"), group="scheduler", exit_on_error=False)
+
+    async def load_accounts(self) -> None:
+        if self.data is None or self.api is None:
+            return
+        await self.api.fetch_accounts()
+        await asyncio.gather(self.api.fetch_balances(), self.api.fetch_positions())
+        # set even without positions so quotes still stream
+        self.positions_ready.set()
+        # allocations depend on the VIX level
+        await self.vix_ready.wait()
+        slot = self.query_one("#AccountsSlot")
+        await slot.remove_children()
+        with TIMER.span("ui.mount_accounts"):
+            await slot.mount(AccountsPanel(self.data.stats_accounts))
+        self.elapsed("accounts panel")
+        for source in ("balances", "positions", "accounts"):
+            self.run_worker(
+                self.schedule(source), group="scheduler", exit_on_error=False
+            )
+        self.run_worker(self.stream_accounts(), group="streamers", exit_on_error=False)
+
+    async def schedule(self, source: str) -> None:
+        # each source refreshes on its own cadence, slower outside market hours
+        cadence = CADENCES[source]
+        while True:
+            await asyncio.sleep(cadence.delay())
+            await self.revalidate(source)
+
+    async def revalidate(self, source: str) -> None:
+        """refreshes one source; its panels keep their values, dimmed, until
+        the refresh succeeds"""
+        # a reload during a scheduled refresh waits for it instead of racing it
+        task = self.refreshing.get(source)
+        if task is None or task.done():
+            task = asyncio.create_task(self.refresh(source))
+            self.refreshing[source] = task
+        await asyncio.shield(task)
+
+    async def refresh(self, source: str) -> None:
+        if self.data is None or self.api is None:
+            return
+        self.stale.add(source)
+        self.mark_stale()
+        try:
+            with TIMER.span(f"ui.refresh.{source}"):
+                match source:
+                    case "vix":
+                        await self.data.get_vix()
+                        fresh = True
+                    case "balances":
+                        fresh = await self.api.fetch_balances()
+                    case "positions":
+                        fresh = await self.api.fetch_positions()
+                        if self.streamer is not None:
+                            symbols = self.data.portfolio.symbols
+                            await self.streamer.subscribe_greeks(symbols)
+                    case "accounts":
+                        # new accounts need their balances right away
+                        fresh = await self.api.fetch_accounts()
+                        fresh = fresh and await self.api.fetch_balances()
+                    case _:
+                        raise ValueError(source)
+        except Exception as e:
+            self.logger(f"Refreshing {source} failed: {e}", header="main.revalidate")
+            return
+        # the new values are painted by the next flush_updates
+        if fresh:
+            self.stale.discard(source)
+        self.mark_stale()
+
+    def mark_stale(self) -> None:
+        for panel in self.query(VixPanel):
+            panel.set_class("vix" in self.stale, "stale")
+        for panel in self.query(AccountsPanel):
+            panel.set_class(bool(self.stale - {"vix"}), "stale")
+
+    async def reload(self) -> None:
+        # keeps the session and widgets, only re-fetches and patches values
+        if not self.query(VixPanel) or not self.query(AccountsPanel):
+            return
+        with TIMER.span("ui.refresh"):
+            await asyncio.gather(
+                self.revalidate("vix"),
+                self.revalidate("balances"),
+                self.revalidate("positions"),
+            )
+
+    async def stream_quotes(self) -> None:
+        if self.api is None:
+            return
+        await self.api.request_quote_token()
+        if self.api.quote_url is None or self.api.quote_token is None:
+            return
+        if self.data is None:
+            return
+        await self.positions_ready.wait()
+        self.streamer = Quote_streamer(
+            url=self.api.quote_url,
+            token=self.api.quote_token,
+            symbols=["VIX"],
+            on_trade=self.on_trade,
+            log=self.api.log,
+            greeks=self.data.portfolio.symbols,
+            on_greeks=self.on_greeks,
+            refresh_token=self.api.refresh_quote_token,
+        )
+        await self.streamer.connect()
+
+    async def stream_accounts(self) -> None:
+        if self.data is None or self.api is None:
+            return
+        token = await self.api.streamer_token()
+        if token is None:
+            return
+        streamer = Account_streamer(
+            url=self.api.websocket_url,
+            token=token,
+            accounts=list(self.data.accounts),
+            on_batch=self.on_account_updates,
+            log=self.api.log,
+            refresh_token=self.api.streamer_token,
+        )
+        await streamer.connect()
+
+    def on_account_updates(self, messages: list[dict[str, Any]]) -> None:
+        if self.data is None:
+            return
+        _, moved = self.data.process_account_updates(messages)
+        if not moved or self.streamer is None:
+            return
+        # balance-only batches and known symbols need no new subscription
+        symbols = [
+            symbol
+            for symbol in self.data.portfolio.symbols
+            if symbol not in self.streamer.subscribed
+        ]
+        if symbols:
+            self.run_worker(self.streamer.subscribe_greeks(symbols))
+
+    def on_trade(self, symbol: str, price: float) -> None:
+        if self.data is not None:
+            self.data.process_vix_tick(price)
+
+    def on_greeks(self, updates: list[tuple[str, float, float]]) -> None:
+        if self.data is not None:
+            self.data.process_greeks(updates)
+
+    async def flush_updates(self) -> None:
+        # runs once per frame; ticks in between only mark the bus
+        if self.data is None or not self.data.bus.dirty:
+            return
+        dirty = self.data.bus.take()
+        with TIMER.span("ui.flush"):
+            for panel in self.query(VixPanel):
+                if "vix" in dirty:
+                    panel.update_vix()
+                if "vix_graphs" in dirty:
+                    panel.update_graphs()
+            if "accounts" in dirty:
+                for panel in self.query(AccountsPanel):
+                    await panel.update_accounts(dirty["accounts"])
+
+    async def action_scroll_accounts(self, step: int) -> None:
+        for panel in self.query(AccountsPanel):
+            await panel.scroll_accounts(step)
+
+    async def action_sort_accounts(self) -> None:
+        for panel in self.query(AccountsPanel):
+            sort = await panel.cycle_sort()
+            self.logger(f"Sorting accounts by {sort}", header="main.sort")
+
+    async def action_filter_accounts(self) -> None:
+        for panel in self.query(AccountsPanel):
+            over_only = await panel.toggle_filter()
+            shown = "over-allocated" if over_only else "all"
+            self.logger(f"Showing {shown} accounts", header="main.filter")
+
+    async def on_unmount(self) -> None:
+        LOGGER.unsubscribe(self.log_sink)
+        if self.api is not None:
+            await self.api.close()
+
+
+class VixPanel(Widget):
+    def __init__(
+        self, vix: VIX, term: TermStructure | None = None, *args, **kwargs
+    ) -> None:
         super().__init__(*args, **kwargs)
         self.vix = vix
-        self.accounts = accounts
+        self.term = term
         self.table_24day = self.vix.from_24day_to_DataTable()
         self.table_5day = self.vix.from_5day_to_DataTable()
         self.table_1day = self.vix.from_today_to_DataTable()
@@ -202,29 +515,121 @@ class AfterProcessing(Widget):
                 (self.table_1day, self.vix.nums_1day, "graph1"),
             ]:
                 with Horizontal(id=f"VixRow_{id[5:]}"):
-                    yield VixStats(table=table)
+                    yield VixStats(table=table, id=f"stats{id[5:]}")
                     yield VixGraphs(id=id, nums=data)
-        with Horizontal(id="AccountsContainer"):
-            for account_number, account in self.accounts.items():
-                with Vertical(id=f"account_{account_number}"):
-                    yield AccountStats(
-                        table=account.to_DataTable(),
-                        id=f"details_{account_number}",
-                    )
+            if self.term is not None:
+                with Horizontal(id="VixRow_term"):
+                    yield TermStats(table=self.term.to_DataTable(), id="term")
+
+    def update_vix(self) -> None:
+        self.query_one("#stats24", VixStats).update_table(
+            self.vix.from_24day_to_DataTable()
+        )
+        self.query_one("#stats5", VixStats).update_table(
+            self.vix.from_5day_to_DataTable()
+        )
+        self.query_one("#stats1", VixStats).update_table(
+            self.vix.from_today_to_DataTable()
+        )
+        if self.term is not None:
+            self.query_one("#term", TermStats).update_table(self.term.to_DataTable())
+
+    def update_graphs(self) -> None:
+        self.query_one("#graph24", VixGraphs).update_nums(self.vix.nums_24day)
+        self.query_one("#graph5", VixGraphs).update_nums(self.vix.nums_5day)
+        self.query_one("#graph1", VixGraphs).update_nums(self.vix.nums_1day)
+
+
+class AccountsPanel(Widget):
+    """Shows one page of accounts in a fixed pool of recycled AccountStats.
+
+    Only the visible accounts are materialized, so mounting and memory do not
+    grow with the number of accounts.
+    """
+
+    def __init__(self, accounts: AccountTable, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.accounts = accounts
+        self.first_row = 0
+        self.sort = 0
+        self.over_only = False
+        self.showing: list[str] = []
+        self.lock = asyncio.Lock()
+
+    def compose(self) -> ComposeResult:
+        yield Horizontal(id="AccountsContainer")
+
+    async def on_resize(self) -> None:
+        await self.update_accounts()
+
+    async def scroll_accounts(self, step: int) -> None:
+        self.first_row = max(0, self.first_row + step)
+        await self.update_accounts()
+
+    async def cycle_sort(self) -> str:
+        self.sort = (self.sort + 1) % len(ACCOUNT_SORTS)
+        self.first_row = 0
+        await self.update_accounts()
+        return ACCOUNT_SORTS[self.sort][0]
+
+    async def toggle_filter(self) -> bool:
+        self.over_only = not self.over_only
+        self.first_row = 0
+        await self.update_accounts()
+        return self.over_only
+
+    async def update_accounts(self, changed: set[str] | None = None) -> None:
+        """repaints slots whose account moved or is in changed (None: all)"""
+        async with self.lock:
+            container = self.query_one("#AccountsContainer")
+            _, column, descending = ACCOUNT_SORTS[self.sort]
+            order = self.accounts.ordered(column, descending, self.over_only)
+            visible = max(1, container.size.width // ACCOUNT_WIDTH)
+            self.first_row = max(0, min(self.first_row, len(order) - visible))
+            numbers = order[self.first_row : self.first_row + visible]
+            slots = list(self.query(AccountStats))
+            # the pool only grows when the panel gets wider
+            while len(slots) < len(numbers):
+                slot = AccountStats(table=Account().to_DataTable())
+                await container.mount(Vertical(slot))
+                slots.append(slot)
+            for i, (slot, number) in enumerate(zip(slots, numbers)):
+                moved = i >= len(self.showing) or self.showing[i] != number
+                if changed is None or moved or number in changed:
+                    slot.update_table(self.accounts[number].to_DataTable())
+            self.showing = numbers
+            for i, slot in enumerate(slots):
+                if slot.parent is not None:
+                    slot.parent.display = i < len(numbers)
 
 
 class VixHelper(App):
     BINDINGS = [
         Binding(key="q", action="quit", description="quit"),
         Binding(key="r", action="refresh", description="refresh"),
+        Binding(key="t", action="timing", description="timing"),
+        Binding(key="T", action="dump_timing", description="dump timing", show=False),
     ]
 
     def on_ready(self) -> None:
         self.push_screen(PortfolioView())
 
     def action_refresh(self):
-        self.pop_screen()
-        self.push_screen(PortfolioView())
+        screen = self.screen
+        if isinstance(screen, PortfolioView):
+            screen.run_worker(screen.reload(), group="reload", exclusive=True)
+
+    def action_timing(self):
+        if not TIMER.enabled:
+            TIMER.enabled = True
+            LOGGER.emit("Timing enabled, press t again for a summary", header="timing")
+            return
+        for line in TIMER.summary().splitlines():
+            LOGGER.emit(line, header="timing")
+
+    def action_dump_timing(self):
+        path = TIMER.dump()
+        LOGGER.emit(f"Timing spans written to {path}", header="timing")
 
 
 if __name__ == "__main__":
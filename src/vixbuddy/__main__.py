@@ -0,0 +1,3 @@
+from vixbuddy.headless import main
+
+main()
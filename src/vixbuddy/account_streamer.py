@@ -1,10 +1,42 @@
+import asyncio
 from dataclasses import dataclass, field
-from json import dumps
-from typing import Any
+from json import dumps, loads
+from typing import Any, Awaitable, Callable
 
 import websockets
 
-from vixbuddy.logger import log
+from vixbuddy.ratelimit import backoff
+
+HEARTBEAT_INTERVAL = 20
+# a burst is collected for this long before it is handed over in one batch
+BATCH_WINDOW = 0.05
+MAX_BATCH = 1000
+# bigger batches are decoded in a thread so the UI keeps drawing
+DECODE_IN_THREAD = 64
+
+
+def decode(raw: list[str | bytes]) -> list[dict[str, Any]]:
+    messages = []
+    for message in raw:
+        try:
+            messages.append(loads(message))
+        except ValueError:
+            continue
+    return messages
+
+
+def coalesce(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """latest update per account (and symbol), notifications only"""
+    latest: dict[tuple, dict[str, Any]] = dict()
+    for message in messages:
+        data = message.get("data")
+        if "type" not in message or not isinstance(data, dict):
+            continue
+        key = (message["type"], data.get("account-number"), data.get("symbol"))
+        # re-inserted so the batch stays in arrival order
+        latest.pop(key, None)
+        latest[key] = message
+    return list(latest.values())
 
 
 @dataclass(slots=True)
@@ -12,8 +44,12 @@ class Account_streamer:
     url: str
     token: str
     accounts: list[str]
+    on_batch: Callable[[list[dict[str, Any]]], Any]
+    log: Callable
+    # returns a current session token before reconnecting
+    refresh_token: Callable[[], Awaitable[str | None]] | None = None
     headers: dict[str, Any] = field(default_factory=dict)
-    body: dict[str, Any] = field(default_factory=dict)
+    request_id: int = 0
 
     def __post_init__(self) -> None:
         self.headers.update(
@@ -24,24 +60,99 @@ class Account_streamer:
                 "Authorization": self.token,
             }
         )
-        self.body.update(
-            {
-                "action": "connect",
-                "value": self.accounts,
-                "auth-token": self.token,
-                "request-id": 42,
-            }
-        )
 
     async def connect(self) -> None:
-        async with websockets.connect(
-            self.url, extra_headers=self.headers
-        ) as websocket:
-            # subscribe to notifications from accounts
-            msg = dumps(self.body)
-            await websocket.send(msg)
-            # make this loop forever?
-            while True:
-                response = await websocket.recv()
-                log(f"{response}", header="streamer.connect")
-                # process messages here
+        """streams until cancelled, reconnecting and resubscribing on errors"""
+        attempt = 0
+        first = True
+        while True:
+            try:
+                # the token may have expired while disconnected
+                if not first and self.refresh_token is not None:
+                    token = await self.refresh_token()
+                    if token is not None:
+                        self.token = self.headers["Authorization"] = token
+                async with websockets.connect(
+                    self.url, additional_headers=self.headers
+                ) as websocket:
+                    await self.subscribe(websocket)
+                    attempt = 0
+                    await self.run(websocket)
+            except (OSError, websockets.WebSocketException) as e:
+                self.log(f"Account streamer closed: {e}", header="streamer.connect")
+            except Exception as e:
+                # anything else is retried too, streaming never ends silently
+                self.log(f"Account streamer failed: {e!r}", header="streamer.connect")
+            first = False
+            delay = backoff(attempt)
+            attempt += 1
+            self.log(f"Reconnecting in {delay:.1f}s", header="streamer.connect")
+            await asyncio.sleep(delay)
+
+    async def send(self, websocket, action: str, value: Any = None) -> None:
+        self.request_id += 1
+        message = {
+            "action": action,
+            "auth-token": self.token,
+            "request-id": self.request_id,
+        }
+        if value is not None:
+            message["value"] = value
+        await websocket.send(dumps(message))
+
+    async def subscribe(self, websocket) -> None:
+        # notifications for these accounts
+        await self.send(websocket, "connect", self.accounts)
+        self.log(
+            f"Subscribed to {len(self.accounts)} accounts",
+            header="streamer.subscribe",
+        )
+
+    async def heartbeat(self, websocket) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await self.send(websocket, "heartbeat")
+
+    async def run(self, websocket) -> None:
+        # the receive loop only queues raw frames, decoding happens in process()
+        queue: asyncio.Queue[str | bytes] = asyncio.Queue()
+        tasks = [
+            asyncio.create_task(self.heartbeat(websocket)),
+            asyncio.create_task(self.process(queue)),
+        ]
+        try:
+            async for message in websocket:
+                queue.put_nowait(message)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # what already arrived is still applied
+            if not queue.empty():
+                await self.flush(self.drain(queue))
+
+    def drain(self, queue: asyncio.Queue) -> list[str | bytes]:
+        raw = []
+        while not queue.empty() and len(raw) < MAX_BATCH:
+            raw.append(queue.get_nowait())
+        return raw
+
+    async def process(self, queue: asyncio.Queue) -> None:
+        while True:
+            first = await queue.get()
+            await asyncio.sleep(BATCH_WINDOW)
+            await self.flush([first, *self.drain(queue)])
+
+    async def flush(self, raw: list[str | bytes]) -> None:
+        if len(raw) > DECODE_IN_THREAD:
+            messages = await asyncio.to_thread(decode, raw)
+        else:
+            messages = decode(raw)
+        if len(messages) < len(raw):
+            skipped = len(raw) - len(messages)
+            self.log(f"Skipped {skipped} undecodable messages", header="streamer.flush")
+        for message in messages:
+            if message.get("status") == "error":
+                self.log(f"{message}", header="streamer.flush")
+        updates = coalesce(messages)
+        if updates:
+            self.on_batch(updates)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Iterator, Sequence
+
+from vixbuddy.stats import Account
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# (highest VIX level, max short premium allocation); each band covers VIX up to
+# and including its bound
+VIX_BANDS: tuple[tuple[float, float], ...] = (
+    (15, 0.25),
+    (20, 0.30),
+    (30, 0.35),
+    (40, 0.40),
+    (math.inf, 0.50),
+)
+UNDEFINED_RISK_BPR = 0.07
+DEFINED_RISK_BPR = 0.05
+THETA_MIN = 0.001
+THETA_MAX = 0.002
+
+
+def max_short_alloc(vix: Any, bands: Sequence[tuple[float, float]] = VIX_BANDS):
+    """allocation for a VIX level, or element-wise for an array of levels"""
+    import numpy as np
+
+    bounds = np.array([bound for bound, _ in bands])
+    allocations = np.array([allocation for _, allocation in bands])
+    # NaN sorts past the last bound and lands in the top band
+    band = np.minimum(np.searchsorted(bounds, vix, side="left"), len(bands) - 1)
+    return allocations[band]
+
+
+def balance_columns(
+    net_liqs: np.ndarray, buying_power_used: np.ndarray, allocation: float
+) -> dict[str, np.ndarray]:
+    """every column that follows from balances and the allocation"""
+    import numpy as np
+
+    return {
+        "net_liquidating_value": net_liqs,
+        "max_short_premium_percent": np.full(len(net_liqs), allocation),
+        "cash_or_low_risk_percent": np.full(len(net_liqs), 1 - allocation),
+        "max_short_premium": net_liqs * allocation,
+        "cash_or_low_risk": net_liqs * (1 - allocation),
+        "max_undefined_risk_bpr": net_liqs * UNDEFINED_RISK_BPR,
+        "max_defined_risk_bpr": net_liqs * DEFINED_RISK_BPR,
+        "portfolio_theta_min": np.ceil(net_liqs * THETA_MIN),
+        "portfolio_theta_max": np.floor(net_liqs * THETA_MAX),
+        "buying_power_used": buying_power_used,
+        "over_allocation": buying_power_used - net_liqs * allocation,
+    }
+
+
+class AccountTable(Mapping[str, Account]):
+    """Allocation columns for every account, computed in one pass.
+
+    Account objects are only built for the rows that are looked up.
+    """
+
+    def __init__(self) -> None:
+        self.numbers: list[str] = []
+        self.nicknames: list[str] = []
+        self.rows: dict[str, int] = dict()
+        self.columns: dict[str, np.ndarray] = dict()
+        self.materialized: dict[str, Account] = dict()
+
+    def load(
+        self,
+        numbers: list[str],
+        nicknames: list[str],
+        net_liqs: np.ndarray,
+        buying_power_used: np.ndarray,
+        vix_last: float,
+        bands: Sequence[tuple[float, float]] = VIX_BANDS,
+        delta: np.ndarray | None = None,
+        theta: np.ndarray | None = None,
+    ) -> None:
+        import numpy as np
+
+        if delta is None or theta is None:
+            delta = theta = np.zeros(len(numbers))
+        allocation = float(max_short_alloc(vix_last, bands))
+        self.numbers = numbers
+        self.nicknames = nicknames
+        self.rows = {number: row for row, number in enumerate(numbers)}
+        self.columns = {
+            **balance_columns(net_liqs, buying_power_used, allocation),
+            "portfolio_delta": np.array(delta, dtype=float),
+            "portfolio_theta": np.array(theta, dtype=float),
+        }
+        self.materialized.clear()
+
+    def update_balances(
+        self,
+        numbers: list[str],
+        net_liqs: np.ndarray,
+        buying_power_used: np.ndarray,
+        vix_last: float,
+        bands: Sequence[tuple[float, float]] = VIX_BANDS,
+    ) -> list[str]:
+        """recomputes only the given accounts, returns the ones that are known"""
+        import numpy as np
+
+        known = [i for i, number in enumerate(numbers) if number in self.rows]
+        if not known:
+            return []
+        rows = np.array([self.rows[numbers[i]] for i in known])
+        allocation = float(max_short_alloc(vix_last, bands))
+        columns = balance_columns(
+            net_liqs[known], buying_power_used[known], allocation
+        )
+        for name, values in columns.items():
+            self.columns[name][rows] = values
+        updated = [numbers[i] for i in known]
+        for number in updated:
+            self.materialized.pop(number, None)
+        return updated
+
+    def set_greeks(self, number: str, delta: float, theta: float) -> None:
+        row = self.rows.get(number)
+        if row is None:
+            return
+        self.columns["portfolio_delta"][row] = delta
+        self.columns["portfolio_theta"][row] = theta
+        self.materialized.pop(number, None)
+
+    def __getitem__(self, number: str) -> Account:
+        account = self.materialized.get(number)
+        if account is None:
+            row = self.rows[number]
+            account = Account(
+                number=number,
+                nickname=self.nicknames[row],
+                **{name: float(column[row]) for name, column in self.columns.items()},
+            )
+            self.materialized[number] = account
+        return account
+
+    def ordered(
+        self,
+        column: str | None = None,
+        descending: bool = True,
+        over_only: bool = False,
+    ) -> list[str]:
+        """account numbers sorted by a column, optionally only over-allocated ones"""
+        import numpy as np
+
+        rows = np.arange(len(self.numbers))
+        if over_only and self.numbers:
+            rows = np.flatnonzero(self.columns["over_allocation"] > 0)
+        if column is not None and len(rows):
+            keys = self.columns[column][rows]
+            rows = rows[np.argsort(-keys if descending else keys, kind="stable")]
+        return [self.numbers[row] for row in rows]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.numbers)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __contains__(self, number: object) -> bool:
+        return number in self.rows
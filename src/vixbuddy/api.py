@@ -1,19 +1,50 @@
+import asyncio
 import os
-import pickle
-from json import dumps
+from functools import partial
+from json import JSONDecodeError, dumps
 from typing import Any, Callable
 
-import requests
-from requests import Response
+import httpx
+from httpx import Response
 
+from vixbuddy.cache import ResponseCache
 from vixbuddy.data import Data, Endpoint
+from vixbuddy.ratelimit import MAX_RETRIES, RETRY_STATUSES, TokenBucket, retry_delay
+from vixbuddy.session import Session, session_path
+from vixbuddy.timing import TIMER
+from vixbuddy.transactions import PER_PAGE, TransactionStore, transactions_path
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+MAX_CONCURRENCY = 8
+REQUESTS_PER_SECOND = 10
+BURST = 20
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+# REST and account streamer hosts, picked with VIXBUDDY_ENV; "local" is the
+# stand-in from `python -m vixbuddy.standin`
+ENVIRONMENTS = {
+    "production": ("https://api.tastyworks.com", "wss://streamer.tastyworks.com"),
+    "cert": ("https://api.cert.tastyworks.com", "wss://streamer.cert.tastyworks.com"),
+    "local": ("http://127.0.0.1:8080", "ws://127.0.0.1:8081"),
+}
 
 # from tastyhelper.logger import log
 
 
 class API:
-    def __init__(self, data: Data, logger: Callable):
+    def __init__(
+        self, data: Data, logger: Callable, cache: ResponseCache | None = None
+    ):
         self.data = data
+        self.cache = cache if cache is not None else ResponseCache()
+        # cached responses are only served to the login that fetched them
+        self.cache.scope = os.getenv("TASTY_LOGIN", "")
         self.log = logger
         self.session_token: str | None = None
         self.remember_token: str | None = None
@@ -22,71 +53,157 @@ class API:
         self.email: str | None = None
         self.username: str | None = None
         self.external_id: str | None = None
-        self.base_url: str = (
-            # "https://api.cert.tastyworks.com"
-            "https://api.tastyworks.com"
-        )
-        self.websocket_url: str = "wss://streamer.cert.tastyworks.com"
+        environment = os.getenv("VIXBUDDY_ENV", "production")
+        if environment not in ENVIRONMENTS:
+            raise ValueError(
+                f"unknown VIXBUDDY_ENV {environment!r}, expected one of:"
+                f" {', '.join(ENVIRONMENTS)}"
+            )
+        base_url, websocket_url = ENVIRONMENTS[environment]
+        self.base_url: str = os.getenv("VIXBUDDY_API_URL", base_url)
+        self.websocket_url: str = os.getenv("VIXBUDDY_STREAMER_URL", websocket_url)
         self.headers = {
             "User-Agent": "tastyhelper/1.0",
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONCURRENCY,
+                max_keepalive_connections=MAX_CONCURRENCY,
+            ),
+        )
+        self.limit = asyncio.Semaphore(MAX_CONCURRENCY)
+        self.bucket = TokenBucket(REQUESTS_PER_SECOND, BURST)
+        self.auth_lock = asyncio.Lock()
+        self.inflight: dict[str, asyncio.Future] = dict()
         log_message = "API initialized"
-        try:
-            with open("../pickles/auth.pickle", "rb") as f:
-                old_auth = pickle.load(f)
-        except FileNotFoundError:
-            old_auth = None
-            pass
-        if old_auth:
-            token = old_auth["data"]["session-token"]
-            self.headers["Authorization"] = token
+        self.session_path = session_path(self.base_url)
+        self.session = Session.load(self.session_path)
+        if self.session.is_valid():
+            self.use_session(self.session)
             log_message += " with saved session token"
         self.log(log_message, header="api.post_init")
 
     async def post(self, endpoint: str, body: dict[str, Any]) -> dict[str, Any] | None:
         try:
-            requests_response = requests.post(
-                self.base_url + endpoint, headers=self.headers, data=dumps(body)
+            response = await self.request(
+                "POST", endpoint, headers=self.headers, content=dumps(body)
             )
-            if not requests_response.ok:
+            if not response.is_success:
                 self.log(
-                    f"Error {requests_response.status_code}",
-                    header="api.get",
+                    f"Error {response.status_code}",
+                    header="api.post",
                 )
                 return None
-            return requests_response.json()
-        except requests.exceptions.ConnectionError:
+            return response.json()
+        except httpx.TimeoutException:
+            self.log("Timed out", header="api.post")
+            return None
+        except httpx.TransportError:
             self.log("Connection error", header="api.post")
             return None
-        except requests.exceptions.JSONDecodeError:
+        except JSONDecodeError:
             self.log("JSON decode error", header="api.post")
             return None
 
-    async def get(self, endpoint: str) -> requests.Response | None:
+    async def get(self, endpoint: str) -> Response | None:
+        # concurrent callers for the same endpoint share one request
+        pending = self.inflight.get(endpoint)
+        if pending is None:
+            pending = asyncio.ensure_future(self.fetch(endpoint))
+            self.inflight[endpoint] = pending
+            pending.add_done_callback(partial(self.finished, endpoint))
+        return await asyncio.shield(pending)
+
+    def finished(self, endpoint: str, future: asyncio.Future) -> None:
+        if self.inflight.get(endpoint) is future:
+            del self.inflight[endpoint]
+
+    async def fetch(self, endpoint: str) -> Response | None:
+        url = self.base_url + endpoint
+        cacheable = self.cache.cacheable(endpoint)
+        if cacheable:
+            entry = self.cache.fresh(endpoint, url)
+            if entry is not None:
+                return entry.to_response()
         try:
-            if self.session_token is None:
-                await self.authenticate()
+            await self.ensure_session()
             if self.session_token is None:
                 return None
-            requests_response = requests.get(
-                self.base_url + endpoint, headers=self.headers
-            )
-            if not requests_response.ok:
+            token = self.session_token
+            response = await self.send_get(endpoint, url, cacheable)
+            if response.status_code == 401:
+                # saved token was revoked server-side, log in again once
+                await self.ensure_session(stale_token=token)
+                if self.session_token is None:
+                    return None
+                response = await self.send_get(endpoint, url, cacheable)
+            if response.status_code == 304:
+                entry = self.cache.revalidated(url)
+                if entry is not None:
+                    return entry.to_response()
+                response = await self.send_get(endpoint, url, False)
+            if not response.is_success:
                 self.log(
-                    f"Error {requests_response.status_code}",
+                    f"Error {response.status_code}",
                     header="api.get",
                 )
                 return None
-            return requests_response
-        except requests.exceptions.ConnectionError:
-            self.log("Connection error", header="api.get")
+            if cacheable:
+                self.cache.store(url, response)
+            return response
+        except httpx.TimeoutException:
+            self.log("Timed out", header="api.get")
             return None
-        except requests.exceptions.JSONDecodeError:
-            self.log("JSON decode error", header="api.get")
+        except httpx.TransportError:
+            self.log("Connection error", header="api.get")
             return None
 
+    async def send_get(self, endpoint: str, url: str, conditional: bool) -> Response:
+        headers = self.headers
+        if conditional:
+            headers = {**headers, **self.cache.validators(url)}
+        return await self.request("GET", endpoint, headers=headers)
+
+    async def request(self, method: str, endpoint: str, **kwargs) -> Response:
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            async with self.limit:
+                response = await self.client.request(method, endpoint, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            delay = retry_delay(response, attempt)
+            self.log(
+                f"{response.status_code} on {endpoint}, retrying in {delay:.1f}s",
+                header="api.request",
+            )
+            self.bucket.pause(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def ensure_session(self, stale_token: str | None = None) -> None:
+        # one login at a time; later callers find the session already valid
+        async with self.auth_lock:
+            if stale_token is not None and self.session_token == stale_token:
+                self.session.expire()
+                self.session_token = None
+            if not self.session.is_valid():
+                with TIMER.span("api.authenticate"):
+                    await self.authenticate()
+
+    async def streamer_token(self) -> str | None:
+        # the account streamer authenticates with the session token
+        await self.ensure_session()
+        return self.session_token
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
     async def request_quote_token(self):
         self.log("Requsting quote token", header="api.request_quote_token")
         response = await self.get("/api-quote-tokens")
@@ -96,59 +213,123 @@ class API:
         self.quote_token = response.json()["data"]["token"]
         self.quote_url = response.json()["data"]["dxlink-url"]
 
-    async def fetch_accounts(self):
+    async def refresh_quote_token(self) -> str | None:
+        # dxLink rejected the token, the cached one must not be served again
+        self.cache.invalidate(self.base_url + "/api-quote-tokens")
+        await self.request_quote_token()
+        return self.quote_token
+
+    async def fetch_accounts(self) -> bool:
         self.log("Fetching accounts", header="api.fetch_accounts")
         accounts_url = "/customers/me/accounts"
-        response = await self.get(endpoint=accounts_url)
-        if response is not None:
-            self.data.store_response(Endpoint.ACCOUNTS, response)
+        with TIMER.span("api.fetch_accounts"):
+            response = await self.get(endpoint=accounts_url)
+        if response is None:
+            return False
+        self.data.store_response(Endpoint.ACCOUNTS, response)
+        return True
 
-    async def fetch_balance(self, account_number: str, balances: list):
+    async def fetch_balance(self, account_number: str) -> Response | None:
         self.log(f"Fetching {account_number}", header="api.fetch_balance")
-        balance = await self.get(f"/accounts/{account_number}/balances")
-        if balance is not None:
-            balances.append(balance)
-
-    async def fetch_balances(self):
-        balances: list[Response] = []
-        for account_number in self.data.accounts.keys():
-            await self.fetch_balance(account_number, balances)
+        return await self.get(f"/accounts/{account_number}/balances")
+
+    async def fetch_balances(self) -> bool:
+        """True if every account's balance came back"""
+        # requests fan out concurrently, bounded by self.limit in get()
+        with TIMER.span("api.fetch_balances"):
+            responses = await asyncio.gather(
+                *(self.fetch_balance(number) for number in self.data.accounts.keys())
+            )
+        balances = [balance for balance in responses if balance is not None]
         if balances:
             self.data.store_response(Endpoint.BALANCES, balances)
+        return len(balances) == len(responses)
 
-    async def fetch_positions(self):
-        raise NotImplementedError
+    async def fetch_positions(self) -> bool:
+        with TIMER.span("api.fetch_positions"):
+            responses = await asyncio.gather(
+                *(
+                    self.get(f"/accounts/{number}/positions")
+                    for number in self.data.accounts.keys()
+                )
+            )
+        positions = [position for position in responses if position is not None]
+        if positions:
+            self.data.store_response(Endpoint.POSITIONS, positions)
+        return len(positions) == len(responses)
 
     async def fetch_transactions(self):
-        raise NotImplementedError
+        if self.data.transactions is None:
+            self.data.transactions = TransactionStore(transactions_path(self.base_url))
+        with TIMER.span("api.fetch_transactions"):
+            await asyncio.gather(
+                *(self.sync_transactions(number) for number in self.data.accounts)
+            )
+
+    async def sync_transactions(self, account_number: str) -> None:
+        if self.data.transactions is None:
+            return
+        # oldest first, starting on the day of the newest stored transaction;
+        # the overlap is dropped on insert
+        query = f"per-page={PER_PAGE}&sort=Asc"
+        high_water = self.data.transactions.high_water(account_number)
+        if high_water is not None:
+            query += f"&start-date={high_water[:10]}"
+        page = 0
+        while True:
+            response = await self.get(
+                f"/accounts/{account_number}/transactions?{query}&page-offset={page}"
+            )
+            if response is None:
+                return
+            self.data.store_response(Endpoint.TRANSACTIONS, response)
+            page += 1
+            pagination = response.json().get("pagination") or {}
+            if page >= pagination.get("total-pages", 0):
+                return
 
     async def authenticate(self) -> dict[str, Any] | None:
         login = os.getenv("TASTY_LOGIN")
         password = os.getenv("TASTY_PASSWORD")
-        if not login or not password:
+        remember_token = self.session.remember_token
+        if not login or not (password or remember_token):
             self.log(
                 "tasty_login and/or tasty_password env variables not set",
                 header="api.authenticate",
             )
             exit(1)
-        body = {
-            "login": login,
-            "password": password,
-            "remember-me": True,
-        }
-        response = await self.post("/sessions", body)
+        response = None
+        if remember_token:
+            self.log("Refreshing session", header="api.authenticate")
+            body = {
+                "login": login,
+                "remember-token": remember_token,
+                "remember-me": True,
+            }
+            response = await self.post("/sessions", body)
+        if response is None and password:
+            body = {
+                "login": login,
+                "password": password,
+                "remember-me": True,
+            }
+            response = await self.post("/sessions", body)
         if response is None:
             return None
-        with open("../pickles/auth.pickle", "wb") as f:
-            pickle.dump(response, f)
         try:
-            self.session_token = response["data"]["session-token"]
-            self.remember_token = response["data"]["remember-token"]
-            self.username = response["data"]["user"]["username"]
-            self.email = response["data"]["user"]["email"]
-            self.external_id = response["data"]["user"]["external-id"]
-            self.headers["Authorization"] = self.session_token  # pyright: ignore
-            return response
-        except AttributeError:
+            session = Session.from_response(response)
+        except (KeyError, TypeError, ValueError):
             self.log("Attribute not found", header="api.authenticate")
             return None
+        session.save(self.session_path)
+        self.use_session(session)
+        return response
+
+    def use_session(self, session: Session) -> None:
+        self.session = session
+        self.session_token = session.session_token
+        self.remember_token = session.remember_token
+        self.username = session.username
+        self.email = session.email
+        self.external_id = session.external_id
+        self.headers["Authorization"] = self.session_token  # pyright: ignore
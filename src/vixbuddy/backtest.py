@@ -0,0 +1,261 @@
+"""Backtest VIX allocation bands against daily VIX history.
+
+    python -m vixbuddy.backtest --download            # full ^VIX daily history
+    python -m vixbuddy.backtest --csv VIX_History.csv --sweep 5000 --top 10
+
+Band tables have the shape of allocation.VIX_BANDS. Every table is evaluated
+over the whole series at once, and sweeps run in chunks of tables.
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Sequence
+
+import numpy as np
+
+from vixbuddy.allocation import VIX_BANDS
+
+# upper bound on table x day x band cells held in memory at once
+CHUNK_CELLS = 20_000_000
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y")
+
+
+@dataclass(slots=True)
+class Results:
+    """metrics for T band tables with B bands each"""
+
+    bounds: np.ndarray  # (T, B)
+    allocations: np.ndarray  # (T, B)
+    occupancy: np.ndarray  # (T, B) fraction of days spent in each band
+    transitions: np.ndarray  # (T,) days the band changed
+    regimes: np.ndarray  # (T, B) number of separate stays in each band
+    mean_stay: np.ndarray  # (T, B) average length of a stay in days
+    mean_allocation: np.ndarray  # (T,)
+    turnover: np.ndarray  # (T,) summed absolute allocation changes
+
+    def row(self, table: int) -> dict:
+        return {
+            "bands": [
+                [float(bound), float(allocation)]
+                for bound, allocation in zip(
+                    self.bounds[table], self.allocations[table]
+                )
+            ],
+            "occupancy": self.occupancy[table].round(4).tolist(),
+            "transitions": int(self.transitions[table]),
+            "regimes": self.regimes[table].tolist(),
+            "mean_stay": self.mean_stay[table].round(1).tolist(),
+            "mean_allocation": round(float(self.mean_allocation[table]), 4),
+            "turnover": round(float(self.turnover[table]), 4),
+        }
+
+
+def parse_date(value: str) -> float:
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value[:10], date_format)
+        except ValueError:
+            continue
+        return parsed.replace(tzinfo=timezone.utc).timestamp()
+    raise ValueError(f"unknown date format: {value}")
+
+
+def load_csv(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """daily closes from a CSV with a date and a close column (CBOE or yahoo)"""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader)]
+        date_column = header.index("date")
+        close_column = header.index("close")
+        rows = [
+            (row[date_column], row[close_column])
+            for row in reader
+            if row and row[close_column].strip() not in ("", "null")
+        ]
+    timestamps = np.array([parse_date(date) for date, _ in rows])
+    closes = np.array([close for _, close in rows], dtype=float)
+    order = np.argsort(timestamps, kind="stable")
+    return timestamps[order], closes[order]
+
+
+def load_bars(symbol: str = "^VIX") -> tuple[np.ndarray, np.ndarray]:
+    """daily closes from the bar cache"""
+    from vixbuddy.bars import BarStore
+
+    frame = BarStore(symbol).load("1d").dropna()
+    return frame.index.asi8 / 1e9, frame["Close"].to_numpy("float64")
+
+
+def download(symbol: str = "^VIX") -> None:
+    """fills the bar cache with the full daily history"""
+    import yfinance as yf
+
+    from vixbuddy.bars import COLUMNS, BarStore
+
+    frame = yf.Ticker(symbol).history(period="max", interval="1d")
+    BarStore(symbol).save("1d", frame[COLUMNS])
+
+
+def as_tables(
+    tables: Sequence[Sequence[tuple[float, float]]] | np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    tables = np.asarray(tables, dtype=float)
+    if tables.ndim == 2:
+        tables = tables[np.newaxis]
+    return tables[:, :, 0], tables[:, :, 1]
+
+
+def bands_of(closes: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    # same rule as allocation.max_short_alloc: the first band whose bound is
+    # >= the level, NaN and anything past the last bound land in the top band
+    count = bounds.shape[1]
+    above = closes[np.newaxis, :, np.newaxis] > bounds[:, np.newaxis, :]
+    band = above.sum(axis=2, dtype=np.int16)
+    band[:, np.isnan(closes)] = count - 1
+    return np.minimum(band, count - 1)
+
+
+def evaluate(
+    closes: np.ndarray,
+    tables: Sequence[Sequence[tuple[float, float]]] | np.ndarray = (VIX_BANDS,),
+) -> Results:
+    """evaluates band tables over a close series; all tables need the same
+    number of bands"""
+    bounds, allocations = as_tables(tables)
+    count, width = bounds.shape
+    days = len(closes)
+    occupancy = np.empty((count, width))
+    regimes = np.empty((count, width), dtype=np.int64)
+    transitions = np.empty(count, dtype=np.int64)
+    mean_allocation = np.empty(count)
+    turnover = np.empty(count)
+    step = max(1, CHUNK_CELLS // max(1, days * width))
+    for start in range(0, count, step):
+        stop = min(count, start + step)
+        band = bands_of(closes, bounds[start:stop])
+        rows = np.arange(stop - start)[:, np.newaxis]
+        # a stay starts on the first day and on every change of band
+        changed = np.diff(band, axis=1) != 0
+        starts = np.concatenate(
+            [np.ones((stop - start, 1), dtype=bool), changed], axis=1
+        )
+        # one bincount per chunk: row * width + band indexes a flat (T, B)
+        flat = (rows * width + band).ravel()
+        size = (stop - start) * width
+        days_in = np.bincount(flat, minlength=size).reshape(-1, width)
+        stays = np.bincount(flat[starts.ravel()], minlength=size).reshape(-1, width)
+        allocation = allocations[start:stop][rows, band]
+        occupancy[start:stop] = days_in / max(1, days)
+        regimes[start:stop] = stays
+        transitions[start:stop] = changed.sum(axis=1)
+        mean_allocation[start:stop] = allocation.mean(axis=1)
+        turnover[start:stop] = np.abs(np.diff(allocation, axis=1)).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_stay = np.where(regimes > 0, occupancy * days / regimes, 0.0)
+    return Results(
+        bounds=bounds,
+        allocations=allocations,
+        occupancy=occupancy,
+        transitions=transitions,
+        regimes=regimes,
+        mean_stay=mean_stay,
+        mean_allocation=mean_allocation,
+        turnover=turnover,
+    )
+
+
+def random_tables(
+    count: int,
+    width: int = len(VIX_BANDS),
+    bound_range: tuple[float, float] = (10, 50),
+    allocation_range: tuple[float, float] = (0.2, 0.6),
+    seed: int | None = None,
+) -> np.ndarray:
+    """(count, width, 2) tables with increasing bounds and allocations; the
+    last bound is always inf like VIX_BANDS"""
+    rng = np.random.default_rng(seed)
+    bounds = np.sort(rng.uniform(*bound_range, (count, width)).round(), axis=1)
+    bounds[:, -1] = math.inf
+    allocations = np.sort(rng.uniform(*allocation_range, (count, width)), axis=1)
+    return np.stack([bounds, allocations.round(2)], axis=2)
+
+
+def report(results: Results, table: int, closes: np.ndarray) -> str:
+    lines = []
+    lower = -math.inf
+    for band, (bound, allocation) in enumerate(
+        zip(results.bounds[table], results.allocations[table])
+    ):
+        lines.append(
+            f"  VIX {lower:>5.1f} - {bound:>5.1f}: {allocation:4.0%}"
+            f"  {results.occupancy[table, band]:6.1%} of days"
+            f"  {results.regimes[table, band]:5d} stays"
+            f"  avg {results.mean_stay[table, band]:6.1f} days"
+        )
+        lower = bound
+    lines.append(
+        f"  {int(results.transitions[table])} transitions over {len(closes)} days,"
+        f" mean allocation {results.mean_allocation[table]:.1%},"
+        f" turnover {results.turnover[table]:.2f}"
+    )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--csv", metavar="PATH", help="daily VIX CSV instead of cache")
+    parser.add_argument(
+        "--download", action="store_true", help="fetch full history into the cache"
+    )
+    parser.add_argument(
+        "--sweep", type=int, default=0, metavar="N", help="random tables to evaluate"
+    )
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument(
+        "--sort",
+        default="transitions",
+        choices=["transitions", "turnover", "mean_allocation"],
+        help="sweep ranking, ascending",
+    )
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.download:
+        download()
+    timestamps, closes = load_csv(args.csv) if args.csv else load_bars()
+    if not len(closes):
+        sys.exit("no daily VIX history, use --download or --csv")
+    first = datetime.fromtimestamp(timestamps[0], timezone.utc)
+    last = datetime.fromtimestamp(timestamps[-1], timezone.utc)
+
+    current = evaluate(closes)
+    output: dict = {"days": len(closes), "current": current.row(0)}
+    if not args.json:
+        print(f"{len(closes)} days, {first:%Y-%m-%d} to {last:%Y-%m-%d}")
+        print(f"current bands:\n{report(current, 0, closes)}")
+    if args.sweep:
+        started = time.perf_counter()
+        tables = random_tables(args.sweep, seed=args.seed)
+        results = evaluate(closes, tables)
+        elapsed = time.perf_counter() - started
+        ranked = np.argsort(getattr(results, args.sort), kind="stable")[: args.top]
+        output["sweep"] = [results.row(table) for table in ranked]
+        if not args.json:
+            print(f"\n{args.sweep} tables in {elapsed:.2f}s, best by {args.sort}:")
+            for table in ranked:
+                print(report(results, table, closes) + "\n")
+    if args.json:
+        print(json.dumps(output, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Open", "High", "Low", "Close"]
+
+# download used when nothing usable is cached yet
+PERIODS = {"1d": "1mo", "30m": "1mo", "5m": "5d", "1m": "2d"}
+
+# how far back yahoo serves each interval; older caches are re-downloaded
+MAX_LOOKBACK = {
+    "1d": None,
+    "30m": timedelta(days=59),
+    "5m": timedelta(days=59),
+    "1m": timedelta(days=6),
+}
+
+# how much history is kept on disk per interval
+RETENTION = {
+    "1d": None,
+    "30m": timedelta(days=40),
+    "5m": timedelta(days=10),
+    "1m": timedelta(days=3),
+}
+
+
+class BarStore:
+    """Columnar on-disk OHLC cache, one memory-mappable .npy file per column."""
+
+    def __init__(self, symbol: str, path: str = "../cache/bars") -> None:
+        self.symbol = symbol
+        self.path = os.path.join(path, symbol.lstrip("^"))
+
+    def load(self, interval: str) -> pd.DataFrame:
+        directory = os.path.join(self.path, interval)
+        try:
+            with open(os.path.join(directory, "tz")) as f:
+                tz = f.read().strip()
+            ts = np.load(os.path.join(directory, "ts.npy"), mmap_mode="r")
+            columns = {
+                column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+                for column in COLUMNS
+            }
+        except (FileNotFoundError, ValueError):
+            return self.empty()
+        if any(len(values) != len(ts) for values in columns.values()):
+            # interrupted write, start over
+            return self.empty()
+        index = pd.DatetimeIndex(pd.to_datetime(ts, utc=True)).tz_convert(tz)
+        return pd.DataFrame(columns, index=index)
+
+    def save(self, interval: str, frame: pd.DataFrame) -> None:
+        directory = os.path.join(self.path, interval)
+        os.makedirs(directory, exist_ok=True)
+        index = pd.DatetimeIndex(frame.index)
+        arrays = {"ts": index.tz_convert("UTC").asi8}
+        arrays.update({column: frame[column].to_numpy("float64") for column in COLUMNS})
+        for name, values in arrays.items():
+            # unique temp names, concurrent saves must not share a half-written file
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=f"{name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, values)
+                os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        with open(os.path.join(directory, "tz"), "w") as f:
+            f.write(str(index.tz))
+
+    def pending(self, interval: str) -> tuple[pd.DataFrame, pd.Timestamp | None]:
+        """cached bars and where a download should start, None for a full period"""
+        cached = self.load(interval)
+        now = pd.Timestamp.now(tz="UTC")
+        lookback = MAX_LOOKBACK[interval]
+        if cached.empty or (lookback and now - cached.index[-1] > lookback):
+            return self.empty(), None
+        # the newest cached bar may still have been forming, fetch it again
+        return cached, cached.index[-1]
+
+    def merge(
+        self, interval: str, cached: pd.DataFrame, fresh: pd.DataFrame
+    ) -> pd.DataFrame:
+        if fresh.empty:
+            return cached
+        fresh = fresh[COLUMNS]
+        if cached.empty:
+            merged = fresh
+        else:
+            cached = cached.tz_convert(fresh.index.tz)
+            merged = pd.concat([cached[cached.index < fresh.index[0]], fresh])
+        retention = RETENTION[interval]
+        if retention:
+            merged = merged[merged.index >= merged.index[-1] - retention]
+        self.save(interval, merged)
+        return merged
+
+    def update(self, ticker, interval: str) -> pd.DataFrame:
+        cached, start = self.pending(interval)
+        if start is None:
+            fresh = ticker.history(period=PERIODS[interval], interval=interval)
+        else:
+            fresh = ticker.history(start=start, interval=interval)
+        return self.merge(interval, cached, fresh)
+
+    def empty(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            columns=COLUMNS, index=pd.DatetimeIndex([], tz="UTC"), dtype="float64"
+        )
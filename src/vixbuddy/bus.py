@@ -0,0 +1,33 @@
+import os
+from typing import Iterable
+
+# repaints per second, however fast quotes and account events arrive
+FPS = float(os.getenv("VIXBUDDY_FPS", "10"))
+
+
+class UpdateBus:
+    """Topics the data layer marked dirty since the UI last took them.
+
+    Marking is cheap and idempotent, so a burst of ticks costs one repaint at
+    the next frame. A topic maps to the keys (account numbers) that changed,
+    or None when everything did.
+    """
+
+    def __init__(self) -> None:
+        self.dirty: dict[str, set[str] | None] = dict()
+
+    def mark(self, topic: str, keys: Iterable[str] | None = None) -> None:
+        if topic in self.dirty and self.dirty[topic] is None:
+            return
+        if keys is None:
+            self.dirty[topic] = None
+            return
+        keys = set(keys)
+        # nothing changed, the next frame has nothing to repaint
+        if not keys:
+            return
+        self.dirty.setdefault(topic, set()).update(keys)  # type: ignore
+
+    def take(self) -> dict[str, set[str] | None]:
+        dirty, self.dirty = self.dirty, dict()
+        return dirty
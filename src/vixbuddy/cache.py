@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+import httpx
+
+CACHE_PATH = "../cache/responses.json"
+
+# seconds a response is served without asking the server; anything not listed
+# (balances, positions) always goes to the network
+TTLS = {
+    "/customers/me/accounts": 24 * 60 * 60,
+    "/api-quote-tokens": 20 * 60 * 60,
+}
+
+
+def write_private(path: str, content: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # may hold credentials: owner read/write only, replaced atomically
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(content, f)
+    os.replace(tmp, path)
+
+
+@dataclass(slots=True)
+class Entry:
+    url: str
+    content: str
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def to_response(self) -> httpx.Response:
+        return httpx.Response(
+            200,
+            content=self.content.encode(),
+            headers={"Content-Type": "application/json"},
+            request=httpx.Request("GET", self.url),
+        )
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttls: dict[str, float] = TTLS,
+        path: str | None = CACHE_PATH,
+        scope: str = "",
+    ):
+        self.ttls = ttls
+        self.path = path
+        # the login the responses belong to, part of every key
+        self.scope = scope
+        self.entries: dict[str, Entry] = dict()
+        if path is None:
+            return
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+            self.entries = {key: Entry(**entry) for key, entry in entries.items()}
+        except (FileNotFoundError, ValueError, TypeError):
+            pass
+
+    def key(self, url: str) -> str:
+        return f"{self.scope} {url}"
+
+    def cacheable(self, endpoint: str) -> bool:
+        return endpoint in self.ttls
+
+    def fresh(self, endpoint: str, url: str) -> Entry | None:
+        entry = self.entries.get(self.key(url))
+        if entry is None or time.time() - entry.fetched_at > self.ttls[endpoint]:
+            return None
+        return entry
+
+    def validators(self, url: str) -> dict[str, str]:
+        entry = self.entries.get(self.key(url))
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def revalidated(self, url: str) -> Entry | None:
+        # 304 Not Modified: the stored body is good for another ttl
+        entry = self.entries.get(self.key(url))
+        if entry is not None:
+            entry.fetched_at = time.time()
+            self.save()
+        return entry
+
+    def store(self, url: str, response: httpx.Response) -> None:
+        self.entries[self.key(url)] = Entry(
+            url=url,
+            content=response.text,
+            fetched_at=time.time(),
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self.save()
+
+    def invalidate(self, url: str) -> None:
+        if self.entries.pop(self.key(url), None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        if self.path is not None:
+            write_private(
+                self.path, {key: asdict(entry) for key, entry in self.entries.items()}
+            )
@@ -1,13 +1,31 @@
+from __future__ import annotations
+
+import asyncio
 import enum
-import math
+import time
 from datetime import timedelta
-from typing import Any, Callable
+from typing import TYPE_CHECKING, Any, Callable, Iterable
 
-import yfinance as yf
-from requests import Response
+from httpx import Response
 
 # from tastyhelper.logger import log
-from vixbuddy.stats import VIX, Account
+from vixbuddy.allocation import AccountTable, max_short_alloc
+from vixbuddy.bus import UpdateBus
+from vixbuddy.positions import Greeks, Portfolio
+from vixbuddy.rolling import Bar, RollingStats, RollingWindow
+from vixbuddy.schedule import session_start
+from vixbuddy.stats import VIX, Account, TermStructure
+from vixbuddy.timing import TIMER
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+    from vixbuddy.bars import BarStore
+    from vixbuddy.symbols import SymbolSet
+    from vixbuddy.transactions import TransactionStore
+
+DAY = 24 * 60 * 60
 
 
 class Endpoint(enum.Enum):
@@ -21,10 +39,26 @@ class Data:
     def __init__(self, logger: Callable) -> None:
         self._accounts: Response | None = None
         self._balances: list[Response] = list()
+        self._positions: list[Response] = list()
+        self.balances: dict[str, dict[str, Any]] = dict()
         self.accounts: dict[str, dict[str, Any]] = dict()
         self.vix: dict[str, Any] = dict()
         self.stats_vix: VIX | None = None
-        self.stats_accounts: dict[str, Account] = dict()
+        self.stats_accounts = AccountTable()
+        self.portfolio = Portfolio()
+        self.transactions: TransactionStore | None = None
+        self.bars: BarStore | None = None
+        self.symbols: SymbolSet | None = None
+        self.stats_term = TermStructure()
+        # closes of the watched symbols, one row each, aligned on trading days
+        self.term_index: pd.DatetimeIndex | None = None
+        self.term_closes: np.ndarray | None = None
+        self.yfinance_lock = asyncio.Lock()
+        self.rolling: RollingStats | None = None
+        # the anchored 1day window starts over with every session
+        self.session = session_start()
+        # widgets repaint from what is marked here, at most once per frame
+        self.bus = UpdateBus()
         self.log = logger
         self.log("Data initialized", header="data.post_init")
 
@@ -41,77 +75,123 @@ class Data:
                 # gui.update_accounts()
             case Endpoint.BALANCES if type(response) == list:
                 self._balances = response
-                self.process_balances()
+                with TIMER.span("data.process_balances"):
+                    self.balances = {
+                        balance["account-number"]: balance
+                        for balance in (r.json()["data"] for r in response)
+                    }
+                    self.process_balances()
                 # gui.update_balances()
-            case Endpoint.POSITIONS:
-                raise NotImplementedError
-            case Endpoint.TRANSACTIONS:
-                raise NotImplementedError
+            case Endpoint.POSITIONS if type(response) == list:
+                self._positions = response
+                with TIMER.span("data.process_positions"):
+                    self.process_positions()
+            case Endpoint.TRANSACTIONS if type(response) == Response:
+                self.process_transactions(response)
             case _:
                 raise ValueError
 
+    def yfinance_sources(self) -> tuple[Any, BarStore, SymbolSet]:
+        # yfinance pulls in pandas; imported on first use, in a worker thread, so
+        # the cold import does not block the event loop
+        import yfinance as yf
+
+        from vixbuddy.bars import BarStore
+        from vixbuddy.symbols import WATCHED, SymbolSet
+
+        if self.bars is None:
+            self.bars = BarStore("^VIX")
+        if self.symbols is None:
+            self.symbols = SymbolSet(WATCHED)
+        return yf.Ticker("^VIX"), self.bars, self.symbols
+
     async def get_vix(self):
         self.log("Fetching VIX history", header="main.get_vix")
-        vix = yf.Ticker("^VIX")
-        self.vix = dict(vix.fast_info.items())
+        vix, bars, symbols = await asyncio.to_thread(self.yfinance_sources)
+        # only bars newer than the cache are downloaded, all intervals at once;
+        # daily bars for every watched symbol come from one download, intraday
+        # bars are only needed for VIX. yf.download keeps module-level state,
+        # so two refreshes must not download at the same time
+        async with self.yfinance_lock:
+            with TIMER.span("data.yfinance"):
+                fast_info, daily, bars_30m, bars_5m, bars_1m = await asyncio.gather(
+                    asyncio.to_thread(lambda: dict(vix.fast_info.items())),
+                    asyncio.to_thread(symbols.update, "1d"),
+                    asyncio.to_thread(bars.update, vix, "30m"),
+                    asyncio.to_thread(bars.update, vix, "5m"),
+                    asyncio.to_thread(bars.update, vix, "1m"),
+                )
+        self.vix = fast_info
         self.vix["history"] = vix
-        self.process_vix()
+        self.vix["1d"] = daily["^VIX"]
+        self.vix["30m"] = bars_30m
+        self.vix["5m"] = bars_5m
+        self.vix["1m"] = bars_1m
+        with TIMER.span("data.process_vix"):
+            self.process_vix()
+        self.process_term_structure(daily)
+        # balances may have arrived first and been waiting on stats_vix
+        self.process_balances()
 
     def process_vix(self):
-        vix_open = self.vix["open"]
-        vix_last = self.vix["lastPrice"]
-        vix_day_low = self.vix["dayLow"]
-        vix_day_high = self.vix["dayHigh"]
-        last_24d = self.vix["history"].history(period="1mo")
-        day24 = last_24d.iloc[0]
-        day5 = last_24d.iloc[-5]
-        day1 = last_24d.iloc[-1]
-        most_recent = last_24d.index.max()
-        day24_30m_prices = self.vix["history"].history(
-            start=most_recent - timedelta(days=24), interval="30m"
-        )
-        day5_5m_prices = self.vix["history"].history(
-            start=most_recent - timedelta(days=5), interval="5m"
+        most_recent = self.vix["1d"].index.max()
+        day24_30m_prices = self.vix["30m"].loc[
+            lambda df: df.index >= most_recent - timedelta(days=24)
+        ]
+        day5_5m_prices = self.vix["5m"].loc[
+            lambda df: df.index >= most_recent - timedelta(days=5)
+        ]
+        day5_1m_prices = self.vix["1m"].loc[
+            lambda df: df.index >= most_recent - timedelta(hours=24)
+        ]
+        self.rolling = RollingStats(
+            {
+                "1day": RollingWindow(),
+                "5day": RollingWindow(span=5 * DAY, resolution=5 * 60),
+                "24day": RollingWindow(span=24 * DAY, resolution=30 * 60),
+            }
         )
-        day5_1m_prices = self.vix["history"].history(
-            start=most_recent - timedelta(hours=24), interval="1m"
+        self.rolling.seed(
+            "1day",
+            [
+                (
+                    most_recent.timestamp(),
+                    self.vix["open"],
+                    self.vix["dayHigh"],
+                    self.vix["dayLow"],
+                    self.vix["lastPrice"],
+                )
+            ],
         )
-        vix_5day_open = float(day5["Open"])
-        vix_24day_open = float(day24["Open"])
-        vix_day_change = vix_last - vix_open
-        vix_5day_change = vix_last - vix_5day_open
-        vix_24day_change = vix_last - vix_24day_open
-        vix_day_change_percent = vix_day_change / vix_last
-        vix_5day_change_percent = vix_5day_change / vix_last
-        vix_24day_change_percent = vix_24day_change / vix_last
-        self.stats_vix = VIX(
-            change_1day=vix_day_change,
-            change_1day_percent=vix_day_change_percent,
-            change_24day=vix_24day_change,
-            change_24day_percent=vix_24day_change_percent,
-            change_5day=vix_5day_change,
-            change_5day_percent=vix_5day_change_percent,
-            high_1day=day1["High"],
-            high_24day=day24_30m_prices["High"].max(),
-            high_5day=day5_5m_prices["High"].max(),
-            # TODO: fix these
-            iv_rank_1day=(vix_last - vix_day_low) / (vix_day_high - vix_day_low) * 100,
-            iv_rank_24day=(vix_last - day24_30m_prices["Low"].min())
-            / (day24_30m_prices["High"].max() - day24_30m_prices["Low"].min())
-            * 100,
-            iv_rank_5day=(vix_last - day5_5m_prices["Low"].min())
-            / (day5_5m_prices["High"].max() - day5_5m_prices["Low"].min())
-            * 100,
-            last=self.vix["lastPrice"],
-            low_1day=self.vix["dayLow"],
-            low_24day=day24_30m_prices["Low"].min(),
-            low_5day=day5_5m_prices["Low"].min(),
-            open_1day=day1["Open"],
-            open_24day=day24["Open"],
-            open_5day=day5["Open"],
-            nums_24day=list(day24_30m_prices.get("Close")),
-            nums_5day=list(day5_5m_prices.get("Close")),
-            nums_1day=list(day5_1m_prices.get("Close")),
+        self.rolling.seed("5day", self.to_bars(day5_5m_prices))
+        self.rolling.seed("24day", self.to_bars(day24_30m_prices))
+        self.rolling.tick(time.time(), self.vix["lastPrice"])
+        self.session = session_start()
+        # updated in place so widgets holding a reference stay current
+        if self.stats_vix is None:
+            self.stats_vix = VIX()
+        self.stats_vix.nums_24day = list(day24_30m_prices.get("Close"))
+        self.stats_vix.nums_5day = list(day5_5m_prices.get("Close"))
+        self.stats_vix.nums_1day = list(day5_1m_prices.get("Close"))
+        self.stats_vix.update(self.rolling)
+        self.bus.mark("vix")
+        self.bus.mark("vix_graphs")
+
+    def process_term_structure(self, daily: dict[str, pd.DataFrame]) -> None:
+        from vixbuddy.symbols import aligned
+
+        self.term_index, self.term_closes = aligned(daily)
+        self.stats_term.update(list(daily), self.term_closes)
+        self.bus.mark("vix")
+
+    def to_bars(self, frame: pd.DataFrame) -> Iterable[Bar]:
+        frame = frame.dropna()
+        return zip(
+            frame.index.asi8 / 1e9,
+            frame["Open"].to_numpy(),
+            frame["High"].to_numpy(),
+            frame["Low"].to_numpy(),
+            frame["Close"].to_numpy(),
         )
 
     def process_accounts(self) -> None:
@@ -125,41 +205,160 @@ class Data:
             self.log(f"Processing {account_number}", header="data.process_accounts")
             self.accounts[account_number] = account
 
-    def process_balances(self) -> None:
+    def process_vix_tick(self, price: float) -> bool:
+        """returns True if the tick moved VIX into another allocation band"""
+        if self.stats_vix is None or self.rolling is None:
+            return False
+        max_short_alloc = self.max_short_alloc()
+        session = session_start()
+        if session != self.session:
+            self.rolling["1day"].clear()
+            self.session = session
+        self.rolling.tick(time.time(), price)
+        self.stats_vix.update(self.rolling)
+        self.bus.mark("vix")
+        if self.max_short_alloc() == max_short_alloc:
+            return False
+        self.log(
+            f"VIX {price:.2f} crossed an allocation band",
+            header="data.process_vix_tick",
+        )
+        self.process_balances()
+        return True
+
+    def max_short_alloc(self) -> float:
         if self.stats_vix is None:
+            return 0.0
+        return float(max_short_alloc(self.stats_vix.last))
+
+    def process_balances(self) -> None:
+        if self.stats_vix is None or not self.balances:
             return
-        match True:
-            case _ if self.stats_vix.last <= 15:
-                max_short_alloc = 0.25
-            case _ if self.stats_vix.last <= 20:
-                max_short_alloc = 0.3
-            case _ if self.stats_vix.last <= 30:
-                max_short_alloc = 0.35
-            case _ if self.stats_vix.last <= 40:
-                max_short_alloc = 0.4
-            case _:
-                max_short_alloc = 0.5
-        for balance in self._balances:
-            self.process_balance(balance.json()["data"], max_short_alloc)
+        # numpy comes with pandas, which is loaded by the time balances are in
+        import numpy as np
 
-    def process_balance(self, balance: dict[str, Any], max_short_alloc: float) -> None:
-        account_number = balance["account-number"]
+        balances = [
+            balance
+            for number, balance in self.balances.items()
+            if number in self.accounts
+        ]
+        numbers = [balance["account-number"] for balance in balances]
+        nicknames = [self.accounts[number]["account"]["nickname"] for number in numbers]
+        net_liqs = np.array(
+            [balance["net-liquidating-value"] for balance in balances], dtype=float
+        )
+        buying_power_used = np.array(
+            [balance.get("maintenance-requirement", 0) for balance in balances],
+            dtype=float,
+        )
+        delta = np.array([self.portfolio.delta.get(n, 0.0) for n in numbers])
+        theta = np.array([self.portfolio.theta.get(n, 0.0) for n in numbers])
+        self.stats_accounts.load(
+            numbers,
+            nicknames,
+            net_liqs,
+            buying_power_used,
+            self.stats_vix.last,
+            delta=delta,
+            theta=theta,
+        )
+        self.bus.mark("accounts")
         self.log(
-            f"Processing balances for {account_number}", header="data.process_balance"
+            f"Processed balances for {len(numbers)} accounts",
+            header="data.process_balances",
         )
-        self.accounts[account_number]["balances"] = balance
-
-        net_liq = float(balance["net-liquidating-value"])
-        self.stats_accounts[account_number] = Account(
-            number=balance["account-number"],
-            nickname=self.accounts[account_number]["account"]["nickname"],
-            net_liquidating_value=net_liq,
-            max_short_premium_percent=max_short_alloc,
-            cash_or_low_risk_percent=(1 - max_short_alloc),
-            max_short_premium=max_short_alloc * net_liq,
-            cash_or_low_risk=(1 - max_short_alloc) * net_liq,
-            max_undefined_risk_bpr=net_liq * 0.07,
-            max_defined_risk_bpr=net_liq * 0.05,
-            portfolio_theta_min=math.ceil(net_liq * 0.001),
-            portfolio_theta_max=math.floor(net_liq * 0.002),
+
+    def process_positions(self) -> None:
+        positions = [
+            position
+            for response in self._positions
+            for position in response.json()["data"]["items"]
+            if position["account-number"] in self.accounts
+        ]
+        self.portfolio.load(positions)
+        for number in self.stats_accounts:
+            self.stats_accounts.set_greeks(
+                number,
+                self.portfolio.delta.get(number, 0.0),
+                self.portfolio.theta.get(number, 0.0),
+            )
+        self.bus.mark("accounts")
+        self.log(
+            f"Processed {len(positions)} positions,"
+            f" {len(self.portfolio.symbols)} option symbols"
+            f" ({self.portfolio.skipped} without greeks)",
+            header="data.process_positions",
         )
+
+    def process_greeks(self, updates: list[Greeks]) -> set[str]:
+        """returns the accounts whose delta/theta changed"""
+        changed = self.portfolio.apply(updates)
+        for number in changed:
+            self.stats_accounts.set_greeks(
+                number, self.portfolio.delta[number], self.portfolio.theta[number]
+            )
+        self.bus.mark("accounts", changed)
+        return changed
+
+    def process_transactions(self, response: Response) -> None:
+        # one page at a time, nothing is kept in memory
+        if self.transactions is None:
+            return
+        items = response.json()["data"]["items"]
+        new = self.transactions.insert(items)
+        self.log(
+            f"Stored {new} of {len(items)} transactions",
+            header="data.process_transactions",
+        )
+
+    def process_account_updates(
+        self, messages: list[dict[str, Any]]
+    ) -> tuple[set[str], set[str]]:
+        """applies a batch of streamed notifications, returns the changed
+        accounts and, separately, those whose positions changed"""
+        balances = [
+            message["data"]
+            for message in messages
+            if message["type"] == "AccountBalance"
+            and message["data"].get("account-number") in self.accounts
+        ]
+        positions = [
+            message["data"]
+            for message in messages
+            if message["type"] == "CurrentPosition"
+            and message["data"].get("account-number") in self.accounts
+        ]
+        moved = self.portfolio.update(positions)
+        changed = set(moved)
+        for number in moved:
+            self.stats_accounts.set_greeks(
+                number, self.portfolio.delta[number], self.portfolio.theta[number]
+            )
+        for balance in balances:
+            number = balance["account-number"]
+            self.balances[number] = {**self.balances.get(number, {}), **balance}
+        if balances and self.stats_vix is not None:
+            import numpy as np
+
+            numbers = [balance["account-number"] for balance in balances]
+            net_liqs = np.array(
+                [self.balances[n]["net-liquidating-value"] for n in numbers],
+                dtype=float,
+            )
+            buying_power_used = np.array(
+                [self.balances[n].get("maintenance-requirement", 0) for n in numbers],
+                dtype=float,
+            )
+            changed.update(
+                self.stats_accounts.update_balances(
+                    numbers, net_liqs, buying_power_used, self.stats_vix.last
+                )
+            )
+        if balances or positions:
+            self.log(
+                f"Applied {len(balances)} balance and {len(positions)} position"
+                " updates",
+                header="data.process_account_updates",
+            )
+        self.bus.mark("accounts", changed)
+        return changed, moved
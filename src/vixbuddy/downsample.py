@@ -0,0 +1,39 @@
+from typing import Sequence
+
+
+def minmax(nums: Sequence[float], buckets: int) -> list[float]:
+    """reduce nums to a (min, max) pair per bucket, kept in time order"""
+    length = len(nums)
+    if buckets <= 0 or length <= 2 * buckets:
+        return list(nums)
+    result: list[float] = []
+    for bucket in range(buckets):
+        start = bucket * length // buckets
+        end = (bucket + 1) * length // buckets
+        low = high = start
+        for i in range(start + 1, end):
+            if nums[i] < nums[low]:
+                low = i
+            elif nums[i] > nums[high]:
+                high = i
+        first, second = sorted((low, high))
+        result.append(nums[first])
+        result.append(nums[second])
+    return result
+
+
+class Downsampler:
+    """Caches the last downsampled series per (series, length, width)."""
+
+    __slots__ = ("key", "result")
+
+    def __init__(self) -> None:
+        self.key: tuple[int, int, int] | None = None
+        self.result: list[float] = []
+
+    def __call__(self, nums: Sequence[float], width: int) -> list[float]:
+        key = (id(nums), len(nums), width)
+        if key != self.key:
+            self.key = key
+            self.result = minmax(nums, width)
+        return self.result
@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from dataclasses import asdict
+from typing import Any
+
+from vixbuddy.api import API
+from vixbuddy.data import Data
+from vixbuddy.ui import print_stats
+
+
+def stderr_logger(message: str, header: str | None = None) -> None:
+    time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+    print(f"{time_str} [{header}]: {message}", file=sys.stderr)
+
+
+def quiet_logger(message: str, header: str | None = None) -> None:
+    pass
+
+
+def finite(value: Any) -> Any:
+    # NaN and inf (empty windows, missing closes) are not valid JSON, they
+    # become null; numpy scalars become plain floats
+    if isinstance(value, dict):
+        return {key: finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite(item) for item in value]
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return number if math.isfinite(number) else None
+
+
+def snapshot(data: Data, series: bool = False) -> dict[str, Any]:
+    vix = asdict(data.stats_vix) if data.stats_vix is not None else {}
+    if not series:
+        vix = {key: value for key, value in vix.items() if not key.startswith("nums_")}
+    return finite(
+        {
+            "time": time.time(),
+            "vix": vix,
+            "term_structure": asdict(data.stats_term),
+            "accounts": {
+                number: asdict(account)
+                for number, account in data.stats_accounts.items()
+            },
+        }
+    )
+
+
+async def emit(data: Data, args: argparse.Namespace) -> None:
+    match args.format:
+        case "text" if data.stats_vix is not None:
+            await print_stats(data.stats_vix, data.stats_accounts)
+        case "json":
+            json.dump(
+                snapshot(data, args.series), sys.stdout, indent=2, allow_nan=False
+            )
+            print()
+        case _:
+            print(json.dumps(snapshot(data, args.series), allow_nan=False))
+    sys.stdout.flush()
+
+
+async def transactions(api: API, data: Data, args: argparse.Namespace) -> None:
+    await api.fetch_accounts()
+    await api.fetch_transactions()
+    if data.transactions is None:
+        return
+    summary = data.transactions.summary(since=args.since or "")
+    json.dump(summary, sys.stdout, indent=None if args.format == "ndjson" else 2)
+    print()
+
+
+async def run(args: argparse.Namespace) -> None:
+    logger = stderr_logger if args.verbose else quiet_logger
+    data = Data(logger=logger)
+    api = API(data=data, logger=logger)
+
+    async def fetch_accounts() -> None:
+        await api.fetch_accounts()
+        await api.fetch_balances()
+
+    try:
+        if args.transactions:
+            await transactions(api, data, args)
+            return
+        await asyncio.gather(data.get_vix(), fetch_accounts())
+        while True:
+            await emit(data, args)
+            if args.watch is None:
+                break
+            await asyncio.sleep(args.watch)
+            await asyncio.gather(data.get_vix(), api.fetch_balances())
+    finally:
+        await api.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="vixbuddy", description="print VIX and account stats without the TUI"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "ndjson", "text"],
+        default=None,
+        help="output format (default: json, or ndjson with --watch)",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="keep running and emit a snapshot every SECONDS",
+    )
+    parser.add_argument(
+        "--series", action="store_true", help="include the sparkline price series"
+    )
+    parser.add_argument(
+        "--transactions",
+        action="store_true",
+        help="sync transactions and print realized P&L, premium and fees",
+    )
+    parser.add_argument(
+        "--since", metavar="DATE", help="start of the --transactions period"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log to stderr")
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = "json" if args.watch is None else "ndjson"
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
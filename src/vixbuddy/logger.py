@@ -1,5 +1,145 @@
+import atexit
+import json
+import os
+import queue
+import threading
 import time
-from typing import Optional
+from collections import deque
+from typing import Any, Optional
+
+LOG_PATH = "../logs/tastyhelper.log"
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 512
+
+
+class Logger:
+    """Queue-backed JSON-lines logger.
+
+    Callers only enqueue; a daemon thread writes records in batches and rotates
+    the file by size. UI sinks are plain deques that the UI drains on its own
+    schedule.
+    """
+
+    def __init__(
+        self,
+        path: str = LOG_PATH,
+        max_bytes: int = MAX_BYTES,
+        backups: int = BACKUPS,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue: queue.SimpleQueue[dict[str, Any] | None] = queue.SimpleQueue()
+        self.sinks: list[deque[dict[str, Any]]] = []
+        self.thread: threading.Thread | None = None
+        self.lock = threading.Lock()
+
+    def emit(
+        self,
+        message: str,
+        header: Optional[str] = None,
+        level: str = "info",
+        to_file: bool = True,
+        **fields: Any,
+    ) -> dict[str, Any]:
+        record = {
+            "time": time.time(),
+            "level": level,
+            "header": header,
+            "message": message,
+            **fields,
+        }
+        for sink in self.sinks:
+            sink.append(record)
+        if to_file:
+            self.start()
+            self.queue.put(record)
+        return record
+
+    def subscribe(self, maxlen: int = 1000) -> deque[dict[str, Any]]:
+        sink: deque[dict[str, Any]] = deque(maxlen=maxlen)
+        self.sinks.append(sink)
+        return sink
+
+    def unsubscribe(self, sink: deque[dict[str, Any]]) -> None:
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="vixbuddy-logger", daemon=True
+                )
+                self.thread.start()
+                atexit.register(self.close)
+
+    def close(self) -> None:
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join(timeout=2)
+        self.thread = None
+
+    def run(self) -> None:
+        # a batch is written FLUSH_INTERVAL after its first record, when it is
+        # full, or on close
+        batch: list[dict[str, Any]] = []
+        deadline = 0.0
+        while True:
+            try:
+                if batch:
+                    timeout = max(0.0, deadline - time.monotonic())
+                    record = self.queue.get(timeout=timeout)
+                else:
+                    record = self.queue.get()
+                    deadline = time.monotonic() + FLUSH_INTERVAL
+            except queue.Empty:
+                self.write(batch)
+                batch = []
+                continue
+            if record is None:
+                if batch:
+                    self.write(batch)
+                return
+            batch.append(record)
+            if len(batch) >= BATCH_SIZE:
+                self.write(batch)
+                batch = []
+
+    def write(self, batch: list[dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(lines)
+                size = f.tell()
+            if size > self.max_bytes:
+                self.rotate()
+        except OSError:
+            # nowhere to report it; drop the batch rather than crash the writer
+            pass
+
+    def rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+LOGGER = Logger()
+
+
+def format_record(record: dict[str, Any], utc: bool = True) -> str:
+    convert = time.gmtime if utc else time.localtime
+    time_str = time.strftime("%Y-%m-%d %H:%M:%S", convert(record["time"]))
+    header = record.get("header")
+    header_str = f" [{header}]: " if header else ": "
+    return time_str + header_str + record["message"]
 
 
 def log(
@@ -8,13 +148,6 @@ def log(
     to_file: bool = True,
     to_stdout: bool = True,
 ):
-    time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
-    header_str = f" [{header}]: " if header else ": "
-    message_str = time_str + header_str + message
-
-    if to_file:
-        with open("../logs/tastyhelper.log", "a") as f:
-            f.write(message_str + "\n")
-
+    record = LOGGER.emit(message, header=header, to_file=to_file)
     if to_stdout:
-        print(message_str)
+        print(format_record(record))
@@ -0,0 +1,103 @@
+from typing import Any, Iterable
+
+Greeks = tuple[str, float, float]  # streamer symbol, delta, theta
+
+
+def streamer_symbol(position: dict[str, Any]) -> str | None:
+    """dxLink symbol, e.g. "SPY   261218P00550000" becomes ".SPY261218P550" """
+    if position.get("streamer-symbol"):
+        return position["streamer-symbol"]
+    symbol = position["symbol"]
+    match position.get("instrument-type"):
+        case "Equity":
+            return symbol
+        case "Equity Option" if len(symbol) == 21:
+            root, expiration, kind = symbol[:6].strip(), symbol[6:12], symbol[12]
+            strike = f"{int(symbol[13:]) / 1000:f}".rstrip("0").rstrip(".")
+            return f".{root}{expiration}{kind}{strike}"
+    return None
+
+
+class Portfolio:
+    """Positions of every account with net delta and theta kept as running sums.
+
+    Each streamed Greeks event only touches the accounts holding that symbol.
+    """
+
+    def __init__(self) -> None:
+        # streamer symbol -> {account number: signed quantity * multiplier}
+        self.holders: dict[str, dict[str, float]] = dict()
+        self.shares: dict[tuple[str, str], float] = dict()
+        self.greeks: dict[str, tuple[float, float]] = dict()
+        self.delta: dict[str, float] = dict()
+        self.theta: dict[str, float] = dict()
+        self.skipped = 0
+
+    def load(self, positions: Iterable[dict[str, Any]]) -> None:
+        self.holders.clear()
+        self.shares.clear()
+        self.delta.clear()
+        self.theta.clear()
+        self.skipped = 0
+        for position in positions:
+            # several lots of one symbol add up
+            self.set_position(position, add=True)
+
+    def update(self, positions: Iterable[dict[str, Any]]) -> set[str]:
+        """replaces streamed positions, returns the accounts whose totals changed"""
+        changed = set()
+        for position in positions:
+            if self.set_position(position):
+                changed.add(position["account-number"])
+        return changed
+
+    def set_position(self, position: dict[str, Any], add: bool = False) -> bool:
+        number = position["account-number"]
+        size = float(position["quantity"]) * float(position.get("multiplier") or 1)
+        if position.get("quantity-direction") == "Short":
+            size = -size
+        self.delta.setdefault(number, 0.0)
+        self.theta.setdefault(number, 0.0)
+        symbol = streamer_symbol(position)
+        if symbol is None:
+            self.skipped += 1
+            return False
+        if position.get("instrument-type") == "Equity":
+            old = self.shares.get((number, symbol), 0.0)
+            size += old if add else 0.0
+            self.shares[(number, symbol)] = size
+            self.delta[number] += size - old
+            return size != old
+        holders = self.holders.setdefault(symbol, dict())
+        old = holders.get(number, 0.0)
+        size += old if add else 0.0
+        if size:
+            holders[number] = size
+        else:
+            holders.pop(number, None)
+            if not holders:
+                del self.holders[symbol]
+        # greeks already streamed for a symbol count right away
+        delta, theta = self.greeks.get(symbol, (0.0, 0.0))
+        self.delta[number] += (size - old) * delta
+        self.theta[number] += (size - old) * theta
+        return size != old
+
+    @property
+    def symbols(self) -> list[str]:
+        """option symbols that need Greeks"""
+        return list(self.holders)
+
+    def apply(self, updates: Iterable[Greeks]) -> set[str]:
+        """applies Greeks events, returns the accounts whose totals changed"""
+        changed: set[str] = set()
+        for symbol, delta, theta in updates:
+            old_delta, old_theta = self.greeks.get(symbol, (0.0, 0.0))
+            if (delta, theta) == (old_delta, old_theta):
+                continue
+            self.greeks[symbol] = (delta, theta)
+            for number, size in self.holders.get(symbol, {}).items():
+                self.delta[number] += size * (delta - old_delta)
+                self.theta[number] += size * (theta - old_theta)
+                changed.add(number)
+        return changed
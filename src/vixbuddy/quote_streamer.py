@@ -0,0 +1,224 @@
+import asyncio
+from dataclasses import dataclass, field
+from json import dumps, loads
+from typing import Any, Awaitable, Callable, Iterable
+
+import websockets
+
+from vixbuddy.ratelimit import backoff
+
+FEED_CHANNEL = 1
+KEEPALIVE_TIMEOUT = 60
+KEEPALIVE_INTERVAL = 30
+SUBSCRIPTION_BATCH = 500
+
+
+@dataclass(slots=True)
+class Quote_streamer:
+    url: str
+    token: str
+    symbols: list[str]
+    on_trade: Callable[[str, float], None]
+    log: Callable
+    fields: list[str] = field(
+        default_factory=lambda: ["eventType", "eventSymbol", "price"]
+    )
+    greeks: list[str] = field(default_factory=list)
+    on_greeks: Callable[[list[tuple[str, float, float]]], None] | None = None
+    greeks_fields: list[str] = field(
+        default_factory=lambda: ["eventType", "eventSymbol", "delta", "theta"]
+    )
+    # returns a new quote token when dxLink rejects the current one
+    refresh_token: Callable[[], Awaitable[str | None]] | None = None
+    websocket: Any = field(default=None, init=False)
+    subscribed: set[str] = field(default_factory=set, init=False)
+    unauthorized: int = field(default=0, init=False)
+    reauthorized: bool = field(default=False, init=False)
+
+    async def connect(self) -> None:
+        """streams until cancelled, reconnecting on errors; Trade and Greeks
+        subscriptions are sent again once the new feed channel opens"""
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    attempt = 0
+                    await self.run(websocket)
+            except (OSError, websockets.WebSocketException) as e:
+                self.log(f"Quote streamer closed: {e}", header="quote_streamer.connect")
+            except Exception as e:
+                # anything else is retried too, streaming never ends silently
+                self.log(
+                    f"Quote streamer failed: {e!r}", header="quote_streamer.connect"
+                )
+            delay = backoff(attempt)
+            attempt += 1
+            self.log(f"Reconnecting in {delay:.1f}s", header="quote_streamer.connect")
+            await asyncio.sleep(delay)
+
+    async def run(self, websocket) -> None:
+        self.unauthorized = 0
+        self.reauthorized = False
+        await self.send(
+            websocket,
+            {
+                "type": "SETUP",
+                "channel": 0,
+                "version": "0.1-vixbuddy",
+                "keepaliveTimeout": KEEPALIVE_TIMEOUT,
+                "acceptKeepaliveTimeout": KEEPALIVE_TIMEOUT,
+            },
+        )
+        keepalive = asyncio.create_task(self.keepalive(websocket))
+        try:
+            async for message in websocket:
+                await self.process(websocket, loads(message))
+        finally:
+            keepalive.cancel()
+            self.websocket = None
+
+    async def send(self, websocket, message: dict[str, Any]) -> None:
+        await websocket.send(dumps(message))
+
+    async def keepalive(self, websocket) -> None:
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            await self.send(websocket, {"type": "KEEPALIVE", "channel": 0})
+
+    async def process(self, websocket, message: dict[str, Any]) -> None:
+        match message.get("type"):
+            case "SETUP":
+                await self.send(
+                    websocket, {"type": "AUTH", "channel": 0, "token": self.token}
+                )
+            case "AUTH_STATE" if message.get("state") == "UNAUTHORIZED":
+                # the server opens with one UNAUTHORIZED before it has seen
+                # the token, any later one means the token was rejected
+                self.unauthorized += 1
+                if self.unauthorized > 1:
+                    await self.reauthorize(websocket)
+            case "AUTH_STATE" if message.get("state") == "AUTHORIZED":
+                await self.send(
+                    websocket,
+                    {
+                        "type": "CHANNEL_REQUEST",
+                        "channel": FEED_CHANNEL,
+                        "service": "FEED",
+                        "parameters": {"contract": "AUTO"},
+                    },
+                )
+            case "CHANNEL_OPENED" if message.get("channel") == FEED_CHANNEL:
+                await self.send(
+                    websocket,
+                    {
+                        "type": "FEED_SETUP",
+                        "channel": FEED_CHANNEL,
+                        "acceptAggregationPeriod": 0.1,
+                        "acceptDataFormat": "COMPACT",
+                        "acceptEventFields": {
+                            "Trade": self.fields,
+                            "Greeks": self.greeks_fields,
+                        },
+                    },
+                )
+                await self.send(
+                    websocket,
+                    {
+                        "type": "FEED_SUBSCRIPTION",
+                        "channel": FEED_CHANNEL,
+                        "add": [
+                            {"type": "Trade", "symbol": symbol}
+                            for symbol in self.symbols
+                        ],
+                    },
+                )
+                self.log(
+                    f"Subscribed to {', '.join(self.symbols)}",
+                    header="quote_streamer.process",
+                )
+                self.websocket = websocket
+                self.subscribed.clear()
+                await self.subscribe_greeks(())
+            case "FEED_DATA":
+                self.process_feed(message["data"])
+            case "ERROR":
+                self.log(
+                    f"{message.get('error')}: {message.get('message')}",
+                    header="quote_streamer.process",
+                )
+                if message.get("error") == "UNAUTHORIZED":
+                    await self.reauthorize(websocket)
+
+    async def reauthorize(self, websocket) -> None:
+        # one new token per connection, a second rejection is not retried
+        if self.reauthorized or self.refresh_token is None:
+            self.log("Quote token rejected", header="quote_streamer.reauthorize")
+            return
+        self.reauthorized = True
+        self.log(
+            "Quote token rejected, requesting a new one",
+            header="quote_streamer.reauthorize",
+        )
+        token = await self.refresh_token()
+        if token is None:
+            return
+        self.token = token
+        await self.send(websocket, {"type": "AUTH", "channel": 0, "token": token})
+
+    async def subscribe_greeks(self, symbols: Iterable[str]) -> None:
+        """adds Greeks subscriptions, sent in batches once the channel is open"""
+        self.greeks = list(dict.fromkeys([*self.greeks, *symbols]))
+        if self.websocket is None:
+            return
+        pending = [symbol for symbol in self.greeks if symbol not in self.subscribed]
+        for i in range(0, len(pending), SUBSCRIPTION_BATCH):
+            batch = pending[i : i + SUBSCRIPTION_BATCH]
+            await self.send(
+                self.websocket,
+                {
+                    "type": "FEED_SUBSCRIPTION",
+                    "channel": FEED_CHANNEL,
+                    "add": [{"type": "Greeks", "symbol": symbol} for symbol in batch],
+                },
+            )
+            self.subscribed.update(batch)
+        if pending:
+            self.log(
+                f"Subscribed to Greeks for {len(pending)} symbols",
+                header="quote_streamer.subscribe_greeks",
+            )
+
+    def process_feed(self, data: list[Any]) -> None:
+        # COMPACT format: [event_type, [v1, v2, ..., v1, v2, ...], event_type, ...]
+        for event_type, values in zip(data[::2], data[1::2]):
+            match event_type:
+                case "Trade":
+                    self.process_trades(values)
+                case "Greeks" if self.on_greeks is not None:
+                    self.on_greeks(self.process_greeks(values))
+
+    def process_trades(self, values: list[Any]) -> None:
+        width = len(self.fields)
+        symbol_index = self.fields.index("eventSymbol")
+        price_index = self.fields.index("price")
+        for i in range(0, len(values), width):
+            price = values[i + price_index]
+            if not isinstance(price, (int, float)) or price != price:
+                continue
+            self.on_trade(values[i + symbol_index], float(price))
+
+    def process_greeks(self, values: list[Any]) -> list[tuple[str, float, float]]:
+        # all events of a message are handed over together
+        width = len(self.greeks_fields)
+        symbol_index = self.greeks_fields.index("eventSymbol")
+        delta_index = self.greeks_fields.index("delta")
+        theta_index = self.greeks_fields.index("theta")
+        updates = []
+        for i in range(0, len(values), width):
+            delta, theta = values[i + delta_index], values[i + theta_index]
+            if not isinstance(delta, (int, float)) or delta != delta:
+                continue
+            if not isinstance(theta, (int, float)) or theta != theta:
+                continue
+            updates.append((values[i + symbol_index], float(delta), float(theta)))
+        return updates
@@ -0,0 +1,89 @@
+import math
+from collections import deque
+from typing import Iterable, Tuple
+
+Bar = Tuple[float, float, float, float, float]  # timestamp (s), open, high, low, close
+
+
+class RollingWindow:
+    """Open/high/low over a sliding time span using monotonic deques.
+
+    Bars within the same `resolution` bucket are merged, so each deque holds at
+    most span / resolution entries. Without a span the window is anchored and
+    never evicts; its owner clears it when the period ends (e.g. the session).
+    """
+
+    __slots__ = ("span", "resolution", "opens", "highs", "lows")
+
+    def __init__(self, span: float | None = None, resolution: float = 60) -> None:
+        self.span = span
+        self.resolution = resolution
+        self.opens: deque[Tuple[float, float]] = deque()
+        self.highs: deque[Tuple[float, float]] = deque()  # decreasing values
+        self.lows: deque[Tuple[float, float]] = deque()  # increasing values
+
+    def append(self, ts: float, open: float, high: float, low: float) -> None:
+        bucket = ts - ts % self.resolution
+        if self.span is not None:
+            self.evict(bucket - self.span)
+        if not self.opens or (self.span is not None and self.opens[-1][0] < bucket):
+            self.opens.append((bucket, open))
+        # a surviving entry of the same bucket already dominates the new value
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        if not self.highs or self.highs[-1][0] != bucket:
+            self.highs.append((bucket, high))
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        if not self.lows or self.lows[-1][0] != bucket:
+            self.lows.append((bucket, low))
+
+    def evict(self, cutoff: float) -> None:
+        for entries in (self.opens, self.highs, self.lows):
+            while entries and entries[0][0] < cutoff:
+                entries.popleft()
+
+    def clear(self) -> None:
+        self.opens.clear()
+        self.highs.clear()
+        self.lows.clear()
+
+    @property
+    def open(self) -> float:
+        return self.opens[0][1] if self.opens else math.nan
+
+    @property
+    def high(self) -> float:
+        return self.highs[0][1] if self.highs else math.nan
+
+    @property
+    def low(self) -> float:
+        return self.lows[0][1] if self.lows else math.nan
+
+
+class RollingStats:
+    """Any number of named windows fed from one price series."""
+
+    def __init__(self, windows: dict[str, RollingWindow]) -> None:
+        self.windows = windows
+        self.last = math.nan
+        self.updated = math.nan
+
+    def __getitem__(self, name: str) -> RollingWindow:
+        return self.windows[name]
+
+    def seed(self, name: str, bars: Iterable[Bar]) -> None:
+        # history can come at a different resolution per window, so it is
+        # loaded into one window at a time; live data then goes to all of them
+        window = self.windows[name]
+        for ts, open, high, low, _ in bars:
+            window.append(ts, open, high, low)
+
+    def append(self, ts: float, open: float, high: float, low: float, close: float):
+        for window in self.windows.values():
+            window.append(ts, open, high, low)
+        self.last = close
+        self.updated = ts
+
+    def tick(self, ts: float, price: float) -> None:
+        self.append(ts, price, price, price, price)
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+# VIX is calculated 03:15-16:15 Eastern on weekdays; exchange holidays are not
+# known here and count as open
+MARKET_OPEN = time(3, 15)
+MARKET_CLOSE = time(16, 15)
+MIN_DELAY = 1.0
+
+
+def market_open(now: datetime | None = None) -> bool:
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    return now.weekday() < 5 and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+def until_open(now: datetime | None = None) -> float:
+    """seconds until the market next opens, 0 while it is open"""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    if market_open(now):
+        return 0.0
+    opens = now.replace(
+        hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0
+    )
+    if now.time() >= MARKET_OPEN:
+        opens += timedelta(days=1)
+    while opens.weekday() > 4:
+        opens += timedelta(days=1)
+    # same tzinfo subtracts wall clocks, compare in UTC to get DST right
+    delta = opens.astimezone(timezone.utc) - now.astimezone(timezone.utc)
+    return delta.total_seconds()
+
+
+def session_start(now: datetime | None = None) -> datetime:
+    """open of the current session, or of the last one outside market hours"""
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    opens = now.replace(
+        hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0
+    )
+    if now.time() < MARKET_OPEN:
+        opens -= timedelta(days=1)
+    while opens.weekday() > 4:
+        opens -= timedelta(days=1)
+    return opens
+
+
+@dataclass(slots=True, frozen=True)
+class Cadence:
+    """seconds between refreshes while the market is open and closed"""
+
+    open: float
+    closed: float
+
+    def delay(self, now: datetime | None = None) -> float:
+        if market_open(now):
+            return self.open
+        # wake up at the open rather than sleeping through it
+        return max(MIN_DELAY, min(self.closed, until_open(now)))
+
+
+CADENCES = {
+    "vix": Cadence(open=60, closed=60 * 60),
+    "balances": Cadence(open=3 * 60, closed=30 * 60),
+    "positions": Cadence(open=5 * 60, closed=60 * 60),
+    "accounts": Cadence(open=60 * 60, closed=6 * 60 * 60),
+}
@@ -0,0 +1,70 @@
+import json
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any
+from urllib.parse import urlparse
+
+from vixbuddy.cache import write_private
+
+SESSION_PATH = "../cache/session.json"
+# tokens are refreshed a little before the server would expire them
+EXPIRY_MARGIN = 5 * 60
+DEFAULT_LIFETIME = 24 * 60 * 60
+
+
+def session_path(base_url: str) -> str:
+    # tokens from one environment are useless against another
+    host = urlparse(base_url).netloc.replace(":", "_")
+    return SESSION_PATH.replace("session.json", f"session-{host}.json")
+
+
+@dataclass(slots=True)
+class Session:
+    session_token: str | None = None
+    remember_token: str | None = None
+    expires_at: float = 0.0
+    username: str | None = None
+    email: str | None = None
+    external_id: str | None = None
+
+    @classmethod
+    def load(cls, path: str = SESSION_PATH) -> "Session":
+        try:
+            with open(path) as f:
+                return cls(**json.load(f))
+        except (FileNotFoundError, ValueError, TypeError):
+            return cls()
+
+    @classmethod
+    def from_response(cls, response: dict[str, Any]) -> "Session":
+        data = response["data"]
+        expiration = data.get("session-expiration")
+        if expiration:
+            # fromisoformat only accepts a trailing Z from Python 3.11 on
+            if expiration.endswith("Z"):
+                expiration = expiration[:-1] + "+00:00"
+            expires_at = datetime.fromisoformat(expiration).timestamp()
+        else:
+            expires_at = time.time() + DEFAULT_LIFETIME
+        return cls(
+            session_token=data["session-token"],
+            remember_token=data.get("remember-token"),
+            expires_at=expires_at,
+            username=data["user"]["username"],
+            email=data["user"]["email"],
+            external_id=data["user"]["external-id"],
+        )
+
+    def is_valid(self) -> bool:
+        return (
+            self.session_token is not None
+            and self.expires_at - EXPIRY_MARGIN > time.time()
+        )
+
+    def expire(self) -> None:
+        self.session_token = None
+        self.expires_at = 0.0
+
+    def save(self, path: str = SESSION_PATH) -> None:
+        write_private(path, asdict(self))
@@ -0,0 +1,399 @@
+"""Local stand-in for the Tastytrade REST API and streamers, for load testing.
+
+    python -m vixbuddy.standin --accounts 2000 --latency 0.05 --error-rate 0.02
+    VIXBUDDY_ENV=local python vixbuddy.py
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from json import dumps, loads
+from typing import Any
+from urllib.parse import parse_qs
+
+import websockets
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    401: "Unauthorized",
+    404: "Not Found",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+
+@dataclass(slots=True)
+class Config:
+    host: str = "127.0.0.1"
+    port: int = 8080
+    ws_port: int = 8081
+    accounts: int = 10
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    message_rate: float = 10.0
+    tokens: set[str] = field(default_factory=set)
+
+
+class Standin:
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.net_liqs = {
+            self.account_number(i): random.lognormvariate(11, 1)
+            for i in range(config.accounts)
+        }
+        self.requests = 0
+
+    def account_number(self, i: int) -> str:
+        return f"5WT{i:05d}"
+
+    async def serve(self) -> None:
+        config = self.config
+        http = await asyncio.start_server(self.handle_http, config.host, config.port)
+        async with http, websockets.serve(self.handle_ws, config.host, config.ws_port):
+            print(
+                f"REST on http://{config.host}:{config.port}, "
+                f"streamers on ws://{config.host}:{config.ws_port}"
+                f" ({config.accounts} accounts)"
+            )
+            await asyncio.Future()
+
+    async def handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        # minimal HTTP/1.1 with keep-alive, enough for httpx
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                status, payload, extra = await self.route(method, target, headers, body)
+                content = dumps(payload).encode()
+                head = [
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(content)}",
+                    *(f"{name}: {value}" for name, value in extra.items()),
+                ]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + content)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(
+        self, method: str, target: str, headers: dict[str, str], body: bytes
+    ) -> tuple[int, Any, dict[str, str]]:
+        self.requests += 1
+        config = self.config
+        await asyncio.sleep(config.latency + random.uniform(0, config.jitter))
+        if random.random() < config.throttle_rate:
+            return 429, {"error": {"code": "too_many_requests"}}, {"Retry-After": "1"}
+        if random.random() < config.error_rate:
+            return 500, {"error": {"code": "injected"}}, {}
+        path, _, query = target.partition("?")
+        parts = path.strip("/").split("/")
+        if method == "POST" and path == "/sessions":
+            return 201, self.session(loads(body or b"{}")), {}
+        if headers.get("authorization") not in config.tokens:
+            return 401, {"error": {"code": "invalid_session"}}, {}
+        match method, parts:
+            case "GET", ["customers", "me", "accounts"]:
+                return 200, self.accounts(), {}
+            case "GET", ["accounts", number, "balances"] if number in self.net_liqs:
+                return 200, self.balances(number), {}
+            case "GET", ["accounts", number, "positions"] if number in self.net_liqs:
+                return 200, self.positions(number), {}
+            case "GET", ["accounts", number, "transactions"] if number in self.net_liqs:
+                params = {key: values[0] for key, values in parse_qs(query).items()}
+                return 200, self.transactions(number, params), {}
+            case "GET", ["api-quote-tokens"]:
+                url = f"ws://{config.host}:{config.ws_port}/dxlink"
+                return 200, {"data": {"token": "standin", "dxlink-url": url}}, {}
+        return 404, {"error": {"code": "not_found"}}, {}
+
+    def session(self, body: dict[str, Any]) -> dict[str, Any]:
+        token = uuid.uuid4().hex
+        self.config.tokens.add(token)
+        expiration = datetime.now(timezone.utc) + timedelta(hours=24)
+        login = body.get("login", "standin")
+        return {
+            "data": {
+                "session-token": token,
+                "remember-token": uuid.uuid4().hex,
+                "session-expiration": expiration.isoformat(),
+                "user": {
+                    "username": login,
+                    "email": f"{login}@example.com",
+                    "external-id": "U0000000000",
+                },
+            }
+        }
+
+    def accounts(self) -> dict[str, Any]:
+        return {
+            "data": {
+                "items": [
+                    {
+                        "account": {
+                            "account-number": number,
+                            "nickname": f"standin {number}",
+                            "margin-or-cash": "Margin",
+                        },
+                        "authority-level": "owner",
+                    }
+                    for number in self.net_liqs
+                ]
+            }
+        }
+
+    def balances(self, number: str) -> dict[str, Any]:
+        self.net_liqs[number] *= 1 + random.gauss(0, 0.001)
+        net_liq = self.net_liqs[number]
+        return {
+            "data": {
+                "account-number": number,
+                "net-liquidating-value": f"{net_liq:.2f}",
+                "cash-balance": f"{net_liq * 0.6:.2f}",
+                "maintenance-requirement": f"{net_liq * 0.3:.2f}",
+                "derivative-buying-power": f"{net_liq * 0.4:.2f}",
+                "updated-at": datetime.now(timezone.utc).isoformat(),
+            }
+        }
+
+    def positions(self, number: str) -> dict[str, Any]:
+        # a few short SPY puts per account, from a shared set of strikes
+        rng = random.Random(number)
+        expiration = datetime.now(timezone.utc) + timedelta(days=45)
+        items = []
+        for strike in rng.sample(range(450, 600, 5), 3):
+            items.append(
+                {
+                    "account-number": number,
+                    "symbol": f"SPY   {expiration:%y%m%d}P{strike * 1000:08d}",
+                    "instrument-type": "Equity Option",
+                    "underlying-symbol": "SPY",
+                    "quantity": rng.randint(1, 10),
+                    "quantity-direction": "Short",
+                    "multiplier": 100,
+                }
+            )
+        return {"data": {"items": items}}
+
+    def transactions(self, number: str, params: dict[str, str]) -> dict[str, Any]:
+        # a year of opening and closing trades, a few per weekday
+        rng = random.Random(number)
+        day = datetime.now(timezone.utc).replace(hour=15, minute=0, second=0)
+        day -= timedelta(days=365)
+        items = []
+        while day < datetime.now(timezone.utc):
+            day += timedelta(days=1)
+            if day.weekday() > 4:
+                continue
+            for _ in range(rng.randint(0, 3)):
+                opening = rng.random() < 0.6
+                quantity = rng.randint(1, 5)
+                value = quantity * rng.uniform(50, 400)
+                executed_at = day + timedelta(minutes=rng.randint(0, 360))
+                items.append(
+                    {
+                        "id": len(items) + int(number[3:]) * 1_000_000,
+                        "account-number": number,
+                        "executed-at": executed_at.isoformat(),
+                        "transaction-type": "Trade",
+                        "transaction-sub-type": "Sell to Open"
+                        if opening
+                        else "Buy to Close",
+                        "action": "Sell to Open" if opening else "Buy to Close",
+                        "symbol": f"SPY   {day:%y%m%d}P00500000",
+                        "underlying-symbol": "SPY",
+                        "instrument-type": "Equity Option",
+                        "quantity": str(quantity),
+                        "value": f"{value:.2f}",
+                        "value-effect": "Credit" if opening else "Debit",
+                        "net-value": f"{value - quantity:.2f}",
+                        "net-value-effect": "Credit" if opening else "Debit",
+                        "commission": f"{quantity:.2f}",
+                        "commission-effect": "Debit",
+                    }
+                )
+        start = params.get("start-date", "")
+        items = [item for item in items if item["executed-at"] >= start]
+        per_page = int(params.get("per-page", 250))
+        offset = int(params.get("page-offset", 0))
+        return {
+            "data": {"items": items[offset * per_page : (offset + 1) * per_page]},
+            "pagination": {
+                "per-page": per_page,
+                "page-offset": offset,
+                "total-items": len(items),
+                "total-pages": -(-len(items) // per_page),
+            },
+        }
+
+    async def handle_ws(self, websocket, path: str | None = None) -> None:
+        if path is None:
+            request = getattr(websocket, "request", None)
+            path = request.path if request is not None else websocket.path
+        try:
+            if path == "/dxlink":
+                await self.dxlink(websocket)
+            else:
+                await self.account_streamer(websocket)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def account_streamer(self, websocket) -> None:
+        sender = None
+        try:
+            async for message in websocket:
+                request = loads(message)
+                action = request.get("action")
+                await websocket.send(
+                    dumps(
+                        {
+                            "status": "ok",
+                            "action": action,
+                            "request-id": request.get("request-id"),
+                        }
+                    )
+                )
+                if action == "connect" and sender is None:
+                    requested = request.get("value", [])
+                    accounts = [a for a in requested if a in self.net_liqs]
+                    sender = asyncio.create_task(
+                        self.send_balances(websocket, accounts)
+                    )
+        finally:
+            if sender is not None:
+                sender.cancel()
+
+    async def send_balances(self, websocket, accounts: list[str]) -> None:
+        if not accounts:
+            return
+        interval = 1 / self.config.message_rate
+        while True:
+            number = random.choice(accounts)
+            message = {"type": "AccountBalance", "data": self.balances(number)["data"]}
+            await websocket.send(dumps(message))
+            if random.random() < 0.1:
+                # a fill on one of the account's positions
+                position = random.choice(self.positions(number)["data"]["items"])
+                position["quantity"] = random.randint(0, 10)
+                await websocket.send(
+                    dumps({"type": "CurrentPosition", "data": position})
+                )
+            await asyncio.sleep(interval)
+
+    async def dxlink(self, websocket) -> None:
+        sender = None
+        subscribed: dict[str, list[str]] = {"Trade": [], "Greeks": []}
+        try:
+            async for message in websocket:
+                request = loads(message)
+                match request.get("type"):
+                    case "SETUP":
+                        await websocket.send(dumps({**request, "version": "standin"}))
+                    case "AUTH":
+                        reply = {"type": "AUTH_STATE", "channel": 0}
+                        await websocket.send(dumps({**reply, "state": "AUTHORIZED"}))
+                    case "CHANNEL_REQUEST":
+                        reply = {**request, "type": "CHANNEL_OPENED"}
+                        await websocket.send(dumps(reply))
+                    case "FEED_SUBSCRIPTION":
+                        for item in request.get("add", []):
+                            subscribed.setdefault(item["type"], []).append(
+                                item["symbol"]
+                            )
+                        if sender is None:
+                            channel = request["channel"]
+                            sender = asyncio.create_task(
+                                self.send_feed(websocket, channel, subscribed)
+                            )
+        finally:
+            if sender is not None:
+                sender.cancel()
+
+    async def send_feed(
+        self, websocket, channel: int, subscribed: dict[str, list[str]]
+    ) -> None:
+        # subscribed keeps growing as batches arrive
+        prices: dict[str, float] = {}
+        interval = 1 / self.config.message_rate
+        while True:
+            trades: list[Any] = []
+            for symbol in subscribed["Trade"]:
+                price = prices.get(symbol, 15.0) * (1 + random.gauss(0, 0.0005))
+                prices[symbol] = price
+                trades += ["Trade", symbol, round(price, 2)]
+            greeks: list[Any] = []
+            symbols = subscribed["Greeks"]
+            for symbol in random.sample(symbols, min(len(symbols), 20)):
+                delta = -random.uniform(0.05, 0.5)
+                greeks += ["Greeks", symbol, delta, -random.uniform(0.01, 0.2)]
+            message = {"type": "FEED_DATA", "channel": channel}
+            data = ["Trade", trades] + (["Greeks", greeks] if greeks else [])
+            await websocket.send(dumps({**message, "data": data}))
+            await asyncio.sleep(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ws-port", type=int, default=8081)
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="random extra latency (seconds)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction answered with 500"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="fraction answered with 429"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=10.0, help="streamer messages per second"
+    )
+    args = parser.parse_args()
+    config = Config(
+        host=args.host,
+        port=args.port,
+        ws_port=args.ws_port,
+        accounts=args.accounts,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        message_rate=args.rate,
+    )
+    started = time.monotonic()
+    standin = Standin(config)
+    try:
+        asyncio.run(standin.serve())
+    except KeyboardInterrupt:
+        elapsed = time.monotonic() - started
+        print(f"\n{standin.requests} requests in {elapsed:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+from __future__ import annotations
+
+import math
 from dataclasses import dataclass, field
-from typing import Any, Tuple
+from typing import TYPE_CHECKING, Any, Tuple
+
+from vixbuddy.rolling import RollingStats
 
-from rich.text import Text
+if TYPE_CHECKING:
+    # rich is only needed to render tables, keep it out of headless imports
+    from rich.text import Text
 
 
 @dataclass(slots=True)
@@ -29,6 +36,32 @@ class VIX:
     open_24day: float = 0.0
     open_5day: float = 0.0
 
+    def update(self, rolling: RollingStats) -> None:
+        # every value is read off the window heads, O(1) per update
+        day, week, month = rolling["1day"], rolling["5day"], rolling["24day"]
+        self.last = rolling.last
+        self.open_1day, self.low_1day, self.high_1day = day.open, day.low, day.high
+        self.open_5day, self.low_5day, self.high_5day = week.open, week.low, week.high
+        self.open_24day, self.low_24day, self.high_24day = (
+            month.open,
+            month.low,
+            month.high,
+        )
+        self.change_1day = self.last - self.open_1day
+        self.change_5day = self.last - self.open_5day
+        self.change_24day = self.last - self.open_24day
+        self.change_1day_percent = self.change_1day / self.last
+        self.change_5day_percent = self.change_5day / self.last
+        self.change_24day_percent = self.change_24day / self.last
+        self.iv_rank_1day = self.rank(self.last, self.low_1day, self.high_1day)
+        self.iv_rank_5day = self.rank(self.last, self.low_5day, self.high_5day)
+        self.iv_rank_24day = self.rank(self.last, self.low_24day, self.high_24day)
+
+    def rank(self, price: float, low: float, high: float) -> float:
+        if high == low:
+            return 0.0
+        return (price - low) / (high - low) * 100
+
     def from_24day_to_DataTable(self) -> list[Tuple[Any]]:
         data_table = [
             ("", "", "", ""),
@@ -116,6 +149,8 @@ class VIX:
         return data_table  # pyright: ignore
 
     def color_change(self, price: float, percent: bool = False) -> Text:
+        from rich.text import Text
+
         spaces_to_add = 0
         style = "bold"
         if price < 0:
@@ -132,9 +167,13 @@ class VIX:
         return Text(price_str, style=style, justify="right")
 
     def color_label(self, label: str) -> Text:
+        from rich.text import Text
+
         return Text(label, style="white", justify="left")
 
     def color_value(self, value: str) -> Text:
+        from rich.text import Text
+
         return Text(value, style="deepskyblue", justify="right")
 
 
@@ -151,6 +190,10 @@ class Account:
     max_defined_risk_bpr: float = 0.0
     portfolio_theta_min: float = 0.0
     portfolio_theta_max: float = 0.0
+    buying_power_used: float = 0.0
+    over_allocation: float = 0.0
+    portfolio_delta: float = 0.0
+    portfolio_theta: float = 0.0
 
     def to_DataTable(self) -> list[Tuple[Any]]:
         data_table = [
@@ -168,6 +211,13 @@ class Account:
                 self.color_label("max short premium"),
                 self.color_value(f"{self.max_short_premium:.2f}"),
             ),
+            (
+                self.color_label("buying power used"),
+                self.color_value(
+                    f"{self.buying_power_used:.2f}",
+                    style="red" if self.over_allocation > 0 else "darkgrey",
+                ),
+            ),
             (
                 self.color_label("max undefined risk"),
                 self.color_value(f"{self.max_undefined_risk_bpr:.2f}"),
@@ -184,11 +234,112 @@ class Account:
                 self.color_label("min portfolio theta"),
                 self.color_value(f"{self.portfolio_theta_min:.2f}"),
             ),
+            (
+                self.color_label("portfolio theta"),
+                self.color_value(
+                    f"{self.portfolio_theta:.2f}",
+                    style="darkgrey"
+                    if self.portfolio_theta_min
+                    <= self.portfolio_theta
+                    <= self.portfolio_theta_max
+                    else "yellow",
+                ),
+            ),
+            (
+                self.color_label("delta/theta"),
+                self.color_value(f"{self.delta_theta_ratio():.2f}"),
+            ),
         ]
         return data_table  # pyright: ignore
 
+    def delta_theta_ratio(self) -> float:
+        if not self.portfolio_theta:
+            return 0.0
+        return self.portfolio_delta / self.portfolio_theta
+
     def color_label(self, label: str) -> Text:
+        from rich.text import Text
+
         return Text(label, style="bold", justify="left")
 
-    def color_value(self, value: str) -> Text:
-        return Text(value, style="darkgrey", justify="right")
+    def color_value(self, value: str, style: str = "darkgrey") -> Text:
+        from rich.text import Text
+
+        return Text(value, style=style, justify="right")
+
+
+@dataclass(slots=True)
+class TermStructure:
+    symbols: list[str] = field(default_factory=list)
+    last: list[float] = field(default_factory=list)
+    change_1day: list[float] = field(default_factory=list)
+    # front over back month, below 1 is contango; NaN when either is missing
+    front_back_ratio: float = math.nan
+
+    def update(self, symbols: list[str], closes: Any) -> None:
+        """closes has one row per symbol, oldest first"""
+        self.symbols = symbols
+        self.front_back_ratio = math.nan
+        if closes.shape[1] == 0:
+            self.last = self.change_1day = [0.0] * len(symbols)
+            return
+        previous = closes[:, -2] if closes.shape[1] > 1 else closes[:, -1]
+        self.last = [float(value) for value in closes[:, -1]]
+        self.change_1day = [float(value) for value in closes[:, -1] - previous]
+        if "^VIX" in symbols and "^VIX3M" in symbols:
+            back = self.last[symbols.index("^VIX3M")]
+            if back and math.isfinite(back):
+                self.front_back_ratio = self.last[symbols.index("^VIX")] / back
+
+    def to_DataTable(self) -> list[Tuple[Any]]:
+        ratio = f"{self.front_back_ratio:.2f}"
+        if not math.isfinite(self.front_back_ratio):
+            ratio = state = ""
+        elif self.front_back_ratio < 1:
+            state = "contango"
+        else:
+            state = "backwardation"
+        data_table = [
+            ("",) * (len(self.symbols) + 1),
+            (
+                self.color_label(" term"),
+                *(self.color_label(symbol.lstrip("^")) for symbol in self.symbols),
+            ),
+            (
+                self.color_label(" last"),
+                *(self.color_value(f"{last:.2f}") for last in self.last),
+            ),
+            (
+                self.color_label(" day"),
+                *(
+                    self.color_value(f"{change:+.2f}", style=self.change_style(change))
+                    for change in self.change_1day
+                ),
+            ),
+            # as wide as the other rows, however many symbols there are
+            (
+                self.color_label(" VIX/VIX3M"),
+                self.color_value(ratio),
+                self.color_label(state),
+                *("",) * len(self.symbols),
+            )[: len(self.symbols) + 1],
+        ]
+        return data_table  # pyright: ignore
+
+    def change_style(self, change: float) -> str:
+        # an unchanged (or unknown) close keeps the plain value style
+        if change > 0:
+            return "green"
+        if change < 0:
+            return "red"
+        return "darkgrey"
+
+    def color_label(self, label: str) -> Text:
+        from rich.text import Text
+
+        return Text(label, style="bold", justify="left")
+
+    def color_value(self, value: str, style: str = "darkgrey") -> Text:
+        from rich.text import Text
+
+        return Text(value, style=style, justify="right")
@@ -0,0 +1,73 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from vixbuddy.bars import COLUMNS, PERIODS, BarStore
+
+# front to back of the VIX curve, then vol of vol
+TERM_STRUCTURE = ("^VIX9D", "^VIX", "^VIX3M", "^VIX6M")
+WATCHED = (*TERM_STRUCTURE, "^VVIX")
+
+
+class SymbolSet:
+    """Cached bars for several symbols, refreshed with one multi-ticker
+    download per interval instead of one history call per symbol."""
+
+    def __init__(self, symbols: Iterable[str], path: str = "../cache/bars") -> None:
+        self.symbols = list(symbols)
+        self.stores = {symbol: BarStore(symbol, path) for symbol in self.symbols}
+
+    def update(self, interval: str) -> dict[str, pd.DataFrame]:
+        import yfinance as yf
+
+        pending = {
+            symbol: store.pending(interval) for symbol, store in self.stores.items()
+        }
+        starts = [start for _, start in pending.values()]
+        # one request window for all: the oldest start, or a full period if
+        # any symbol has nothing usable cached
+        if any(start is None for start in starts):
+            window = {"period": PERIODS[interval]}
+        else:
+            window = {"start": min(starts)}  # type: ignore
+        fresh = yf.download(
+            self.symbols,
+            interval=interval,
+            group_by="ticker",
+            auto_adjust=False,
+            ignore_tz=False,
+            progress=False,
+            **window,
+        )
+        frames = {}
+        for symbol, (cached, _) in pending.items():
+            bars = self.split(fresh, symbol)
+            frames[symbol] = self.stores[symbol].merge(interval, cached, bars)
+        return frames
+
+    def split(self, fresh: pd.DataFrame, symbol: str) -> pd.DataFrame:
+        if fresh.empty:
+            return fresh
+        if isinstance(fresh.columns, pd.MultiIndex):
+            if symbol not in fresh.columns.get_level_values(0):
+                return fresh.iloc[0:0]
+            fresh = fresh[symbol]
+        # rows only another symbol traded on
+        return fresh[COLUMNS].dropna(how="all")
+
+
+def aligned(
+    frames: dict[str, pd.DataFrame], column: str = "Close"
+) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    """one row per symbol on the union of their timestamps, gaps carried forward"""
+    series = {
+        symbol: frame[column].tz_convert("UTC")
+        for symbol, frame in frames.items()
+        if not frame.empty
+    }
+    if not series:
+        return pd.DatetimeIndex([], tz="UTC"), np.empty((len(frames), 0))
+    closes = pd.concat(series, axis=1).sort_index().ffill()
+    closes = closes.reindex(columns=list(frames))
+    return pd.DatetimeIndex(closes.index), closes.to_numpy("float64").T
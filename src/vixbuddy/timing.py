@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any
+
+SAMPLES = 256
+DUMP_PATH = "../logs/timing.json"
+
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: "Timer", name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.timer.record(self.name, self.start, time.perf_counter() - self.start)
+
+
+class Timer:
+    """Per-stage latency samples; span() is a shared no-op while disabled."""
+
+    def __init__(self, enabled: bool = False, samples: int = SAMPLES) -> None:
+        self.enabled = enabled
+        self.samples = samples
+        self.latencies: dict[str, deque[float]] = dict()
+        self.spans: deque[tuple[str, float, float]] = deque(maxlen=samples * 16)
+
+    def span(self, name: str) -> Span | nullcontext:
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        latencies = self.latencies.get(name)
+        if latencies is None:
+            latencies = self.latencies[name] = deque(maxlen=self.samples)
+        latencies.append(duration)
+        self.spans.append((name, start, duration))
+
+    def stats(self, name: str) -> dict[str, float]:
+        ordered = sorted(self.latencies[name])
+        return {
+            "count": len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+        }
+
+    def summary(self) -> str:
+        if not self.latencies:
+            return "no spans recorded"
+        lines = []
+        for name in sorted(self.latencies):
+            stats = self.stats(name)
+            lines.append(
+                f"{name}: p50 {stats['p50'] * 1000:.0f}ms"
+                f" p95 {stats['p95'] * 1000:.0f}ms"
+                f" max {stats['max'] * 1000:.0f}ms (n={stats['count']})"
+            )
+        return "\n".join(lines)
+
+    def dump(self, path: str = DUMP_PATH) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "stats": {name: self.stats(name) for name in self.latencies},
+                    "spans": [
+                        {"name": name, "start": start, "duration": duration}
+                        for name, start, duration in self.spans
+                    ],
+                },
+                f,
+                indent=2,
+            )
+        return path
+
+
+TIMER = Timer(enabled=os.getenv("VIXBUDDY_TIMING", "") not in ("", "0"))
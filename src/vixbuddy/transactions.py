@@ -0,0 +1,162 @@
+import json
+import os
+import sqlite3
+from typing import Any, Iterable
+from urllib.parse import urlparse
+
+TRANSACTIONS_PATH = "../cache/transactions.db"
+PER_PAGE = 250
+FEES = (
+    "commission",
+    "clearing-fees",
+    "regulatory-fees",
+    "proprietary-index-option-fees",
+)
+# transactions that close a position without a "... to Close" action
+CLOSING_SUB_TYPES = (
+    "Expiration",
+    "Assignment",
+    "Exercise",
+    "Cash Settled Expiration",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    executed_at TEXT NOT NULL,
+    type TEXT,
+    sub_type TEXT,
+    action TEXT,
+    symbol TEXT,
+    underlying TEXT,
+    instrument_type TEXT,
+    quantity REAL NOT NULL DEFAULT 0,
+    value REAL NOT NULL DEFAULT 0,
+    net_value REAL NOT NULL DEFAULT 0,
+    fees REAL NOT NULL DEFAULT 0,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_account_executed_at
+    ON transactions (account, executed_at);
+"""
+
+# realized P&L counts symbols that are flat as of the end of the period, booked
+# on the date of their last transaction
+SUMMARY = """
+WITH closed AS (
+    SELECT account, symbol, MAX(executed_at) AS closed_at
+    FROM transactions
+    WHERE symbol IS NOT NULL AND executed_at < :until
+    GROUP BY account, symbol
+    HAVING SUM(CASE WHEN action LIKE '% to Open' THEN quantity ELSE 0 END)
+         = SUM(CASE WHEN action LIKE '% to Close' OR sub_type IN ({closing})
+                    THEN quantity ELSE 0 END)
+       AND SUM(CASE WHEN action LIKE '% to Open' THEN 1 ELSE 0 END) > 0
+)
+SELECT
+    t.account,
+    SUM(CASE WHEN t.executed_at >= :since THEN 1 ELSE 0 END) AS transactions,
+    SUM(CASE WHEN t.executed_at >= :since THEN t.fees ELSE 0 END) AS fees,
+    SUM(CASE WHEN t.executed_at >= :since AND t.action = 'Sell to Open'
+             AND t.instrument_type LIKE '%Option' THEN t.value ELSE 0 END) AS premium,
+    SUM(CASE WHEN c.closed_at >= :since THEN t.net_value ELSE 0 END) AS realized
+FROM transactions t
+LEFT JOIN closed c ON c.account = t.account AND c.symbol = t.symbol
+WHERE t.executed_at < :until {account}
+GROUP BY t.account
+ORDER BY t.account
+"""
+
+
+def transactions_path(base_url: str) -> str:
+    # one store per host, like sessions
+    host = urlparse(base_url).netloc.replace(":", "_")
+    return TRANSACTIONS_PATH.replace("transactions.db", f"transactions-{host}.db")
+
+
+def signed(item: dict[str, Any], key: str) -> float:
+    # amounts are positive strings with a separate Credit/Debit effect
+    amount = float(item.get(key) or 0)
+    return -amount if item.get(f"{key}-effect") == "Debit" else amount
+
+
+class TransactionStore:
+    """Transaction history in SQLite, indexed by account and execution time."""
+
+    def __init__(self, path: str = TRANSACTIONS_PATH) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def insert(self, items: Iterable[dict[str, Any]]) -> int:
+        """stores one page, returns how many transactions were new"""
+        rows = [
+            (
+                item["id"],
+                item["account-number"],
+                item["executed-at"],
+                item.get("transaction-type"),
+                item.get("transaction-sub-type"),
+                item.get("action"),
+                item.get("symbol"),
+                item.get("underlying-symbol"),
+                item.get("instrument-type"),
+                float(item.get("quantity") or 0),
+                signed(item, "value"),
+                signed(item, "net-value"),
+                -sum(signed(item, fee) for fee in FEES),
+                json.dumps(item),
+            )
+            for item in items
+        ]
+        before = self.db.total_changes
+        with self.db:
+            # pages overlap at the high-water mark, duplicates are ignored
+            self.db.executemany(
+                "INSERT OR IGNORE INTO transactions VALUES"
+                " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return self.db.total_changes - before
+
+    def high_water(self, account: str) -> str | None:
+        """executed-at of the newest stored transaction"""
+        row = self.db.execute(
+            "SELECT MAX(executed_at) FROM transactions WHERE account = ?", (account,)
+        ).fetchone()
+        return row[0]
+
+    def summary(
+        self,
+        account: str | None = None,
+        since: str = "",
+        until: str = "9999",
+    ) -> dict[str, dict[str, float]]:
+        """realized P&L, premium collected and fees per account for a period
+
+        since and until are ISO dates or timestamps, until is exclusive.
+        """
+        query = SUMMARY.format(
+            closing=", ".join(f"'{sub_type}'" for sub_type in CLOSING_SUB_TYPES),
+            account="AND t.account = :account" if account else "",
+        )
+        params = {"since": since, "until": until, "account": account}
+        self.db.row_factory = sqlite3.Row
+        try:
+            rows = self.db.execute(query, params).fetchall()
+        finally:
+            self.db.row_factory = None
+        return {
+            row["account"]: {
+                "transactions": row["transactions"],
+                "realized": row["realized"],
+                "premium": row["premium"],
+                "fees": row["fees"],
+            }
+            for row in rows
+        }
+
+    def close(self) -> None:
+        self.db.close()
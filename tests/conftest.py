@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the vixbuddy package lives in src/, next to the vixbuddy.py app
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
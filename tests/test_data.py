@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("numpy")
+
+from vixbuddy.data import Data  # noqa: E402
+
+ACCOUNT = "5WX00001"
+OPTION = "SPY   261218P00550000"
+
+
+def quiet(message: str, header: str | None = None) -> None:
+    pass
+
+
+def position(quantity: int) -> dict:
+    return {
+        "type": "CurrentPosition",
+        "data": {
+            "account-number": ACCOUNT,
+            "symbol": OPTION,
+            "instrument-type": "Equity Option",
+            "quantity": quantity,
+            "quantity-direction": "Short",
+            "multiplier": 100,
+        },
+    }
+
+
+@pytest.fixture
+def data() -> Data:
+    data = Data(logger=quiet)
+    data.accounts = {ACCOUNT: {"account": {"nickname": "test"}}}
+    return data
+
+
+def test_position_batch(data: Data) -> None:
+    changed, moved = data.process_account_updates([position(2)])
+    assert changed == moved == {ACCOUNT}
+    assert data.portfolio.symbols == [".SPY261218P550"]
+    assert data.bus.take() == {"accounts": {ACCOUNT}}
+
+
+def test_balance_only_batch_moves_nothing(data: Data) -> None:
+    balance = {"type": "AccountBalance", "data": {"account-number": ACCOUNT}}
+    changed, moved = data.process_account_updates([balance])
+    assert moved == set()
+
+
+def test_greeks_batch(data: Data) -> None:
+    data.process_account_updates([position(2)])
+    data.bus.take()
+    changed = data.process_greeks([(".SPY261218P550", 0.25, -0.05)])
+    assert changed == {ACCOUNT}
+    assert data.portfolio.delta[ACCOUNT] == pytest.approx(-50.0)
+    assert data.portfolio.theta[ACCOUNT] == pytest.approx(10.0)
+    assert data.bus.take() == {"accounts": {ACCOUNT}}
+    # an unchanged event marks nothing
+    assert data.process_greeks([(".SPY261218P550", 0.25, -0.05)]) == set()
+    assert not data.bus.dirty